@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+
+import sys
+
+# The snippet is shared with tests/test_import.py, which checks no optional modules are loaded
+from tests.test_import import run_snippet
+
+# Fail when a fresh interpreter takes longer than this to import the client
+BUDGET_SECONDS = 0.15
+
+
+def measure(runs=5):
+    results = [run_snippet() for _ in range(runs)]
+
+    return min(r['elapsed'] for r in results), set(results[0]['modules'])
+
+
+if __name__ == '__main__':
+    elapsed, modules = measure()
+
+    print(f"[I] Import max and Client in {elapsed * 1000:.1f} ms (budget {BUDGET_SECONDS * 1000:.0f} ms)")
+    print(f"[I] Loaded max submodules: {', '.join(sorted(m for m in modules if m.startswith('max')))}")
+
+    if elapsed > BUDGET_SECONDS:
+        sys.exit('[X] Import time is over budget')
@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+
+from timeit import timeit
+
+# The legacy encoder and cases are shared with tests/test_builder.py, which checks their equivalence
+from tests.test_builder import CASES
+from tests.test_builder import NONCE
+from tests.test_builder import current_url
+from tests.test_builder import legacy_url
+
+
+def benchmark(number=20000):
+    for name, func in (('legacy', legacy_url), ('current', current_url)):
+        elapsed = timeit(lambda: [func(s, e, q, NONCE) for s, e, q in CASES], number=number)
+        rate = number * len(CASES) / elapsed
+
+        print(f"[I] {name:>8}: {rate:,.0f} urls/s")
+
+
+if __name__ == '__main__':
+    benchmark()
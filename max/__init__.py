@@ -1,3 +1,38 @@
 """
 An unofficial Python wrapper for the MAX exchange API v2
 """
+
+import importlib
+
+# Public names and their submodules, a submodule is imported on first access
+_exports = {
+    'Client': 'client',
+    'ClientManager': 'manager',
+    'HealthTracker': 'health',
+    'ProcessPoolClient': 'pool',
+    'Reconciler': 'reconcile',
+    'TickerPoller': 'poller',
+    'TradeAggregator': 'ohlcv',
+    'Transport': 'transport',
+    'PooledTransport': 'transport',
+    'Portfolio': 'portfolio',
+    'RealizedPnL': 'portfolio',
+    'RecordingTransport': 'transport',
+    'ReplayTransport': 'transport',
+}
+
+__all__ = sorted(_exports)
+
+
+def __getattr__(name):
+    if name not in _exports:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(f".{_exports[name]}", __name__), name)
+    globals()[name] = value
+
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_exports))
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+from urllib.parse import quote_plus
+
+from .constants import PRIVATE_API_URL
+from .constants import PRIVATE_API_VERSION
+from .constants import PUBLIC_API_URL
+from .constants import PUBLIC_API_VERSION
+
+# Characters kept as is in query, same as urlencode(query, True, '/[]')
+QUERY_SAFE = '/[]'
+
+_templates = {}
+_quoted_keys = {}
+
+
+def build_base_url(scope, endpoint):
+    """
+    :param scope: 'public' or 'private'
+    :param endpoint: the endpoint without version and suffix, e.g. 'trades/my'
+    :return: the full url without query, cached for every endpoint
+    """
+
+    url = _templates.get((scope, endpoint))
+
+    if url is None:
+        if scope.lower() == 'private':
+            url = f"{PRIVATE_API_URL}/{PRIVATE_API_VERSION}/{endpoint}.json"
+        else:
+            url = f"{PUBLIC_API_URL}/{PUBLIC_API_VERSION}/{endpoint}.json"
+
+        _templates[(scope, endpoint)] = url
+
+    return url
+
+
+def _quote_key(key):
+    quoted = _quoted_keys.get(key)
+
+    if quoted is None:
+        quoted = _quoted_keys[key] = quote_plus(key, QUERY_SAFE)
+
+    return quoted
+
+
+def _quote_value(value):
+    if value is True:
+        return 'true'
+    if value is False:
+        return 'false'
+    if type(value) is str:
+        return quote_plus(value, QUERY_SAFE)
+
+    return quote_plus(str(value), QUERY_SAFE)
+
+
+def encode_query(body):
+    """
+    Encode the body into query string in a single pass, keeping the order of
+    the body, so the url and the signed payload always list fields the same
+
+    :param body: the dict to be signed in X-MAX-PAYLOAD
+    :return: the encoded query string
+    """
+
+    parts = []
+
+    for key, value in body.items():
+        # Fix "401 Payload is not consistent .."
+        # state[]=cancel&state[]=wait&state[]=done
+        # {"path": "/api/v2/orders.json", "state": ["cancel", "wait", "done"]}
+        if type(value) is list or type(value) is tuple:
+            quoted = _quote_key(key if key[-2:] == '[]' else f"{key}[]")
+
+            for item in value:
+                parts.append(f"{quoted}={_quote_value(item)}")
+        else:
+            parts.append(f"{_quote_key(key)}={_quote_value(value)}")
+
+    return '&'.join(parts)
+
+
+def build_url(scope, endpoint, body=None):
+    """
+    :param scope: 'public' or 'private'
+    :param endpoint: the endpoint without version and suffix, e.g. 'trades/my'
+    :param body: the fields to be sent as query (optional)
+    :return: the full url with query
+    """
+
+    url = build_base_url(scope, endpoint)
+
+    return f"{url}?{encode_query(body)}" if body else url
@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+
+import argparse
+import csv
+import gzip
+import io
+import json
+import os
+import sys
+import zlib
+
+from concurrent.futures import ThreadPoolExecutor
+
+from time import time as _time
+
+from .client import Client
+from .constants import PRIVATE_RATE_LIMIT
+from .constants import PRIVATE_RATE_PERIOD
+from .constants import PUBLIC_RATE_LIMIT
+from .constants import PUBLIC_RATE_PERIOD
+from .helpers import TokenBucket
+from .reconcile import ALL_STATES
+
+KLINE_FIELDS = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+
+
+def _fetch_deposits(client, args, cursor, page, limit):
+    return client.get_private_deposit_history(args.currency, cursor['from'], cursor['to'],
+                                              pagination=True, page=page, limit=limit)
+
+
+def _fetch_withdrawals(client, args, cursor, page, limit):
+    return client.get_private_withdrawal_history(args.currency, cursor['from'], cursor['to'],
+                                                 pagination=True, page=page, limit=limit)
+
+
+def _fetch_rewards(client, args, cursor, page, limit):
+    return client.get_private_reward_history(args.currency, cursor['from'], cursor['to'],
+                                             pagination=True, page=page, limit=limit)
+
+
+def _fetch_trades(client, args, cursor, page, limit):
+    # Trades after the last exported one, so resuming never depends on page offsets
+    return client.get_private_trade_history(args.pair, _from=cursor.get('id', ''), sort='asc', page=page, limit=limit)
+
+
+def _fetch_orders(client, args, cursor, page, limit):
+    # Orders have no id filter, skip the pages before the last exported one, the rest are filtered by id
+    page += cursor.get('count', 0) // limit
+
+    return client.get_private_order_history(args.pair, list(ALL_STATES), sort='asc', page=page, limit=limit)
+
+
+# Paged private exports, name -> (fetcher, requires pair, newest first)
+EXPORTS = {
+    'deposits': (_fetch_deposits, False, True),
+    'withdrawals': (_fetch_withdrawals, False, True),
+    'rewards': (_fetch_rewards, False, True),
+    'trades': (_fetch_trades, True, False),
+    'orders': (_fetch_orders, True, False),
+}
+
+
+class Writer(object):
+    """
+    Write records to NDJSON or CSV file page by page, compressed by gzip if
+    the path ends with .gz, and append to the file when resuming
+
+    The size is the bytes written to the file, or to PATH.part for gzip output,
+    which is appended to the output as a whole member on close, so the output
+    never holds an unterminated member. The size saved with the state tells
+    how much a killed run had written for sure, the rest is dropped on resume
+    """
+
+    def __init__(self, path, _format, columns=None, size=None):
+        self._path = path
+        self._format = _format
+        self.columns = columns
+
+        if path.endswith('.gz'):
+            self._part = f"{path}.part"
+
+            if os.path.exists(self._part):
+                _recover_part(self._part, path, size or 0)
+
+            exists = os.path.exists(path) and os.path.getsize(path) > 0
+            self._file = gzip.open(self._part, 'wt', encoding='utf-8', newline='')
+            self.size = 0
+        else:
+            self._part = None
+
+            if os.path.exists(path) and size is not None and os.path.getsize(path) > size:
+                _log(f"[I] Dropped {os.path.getsize(path) - size} bytes written after the last saved state")
+                os.truncate(path, size)
+
+            exists = os.path.exists(path) and os.path.getsize(path) > 0
+            self._file = open(path, 'a', encoding='utf-8', newline='')
+            self.size = os.path.getsize(path)
+
+        self._csv = None
+        self._header = not exists
+
+    def write(self, records):
+        # Format the page first, so the size counts exactly what was written
+        buffer = io.StringIO()
+
+        if self._format == 'csv' and len(records) > 0:
+            if self.columns is None:
+                self.columns = list(records[0])
+
+            rows = csv.DictWriter(buffer, self.columns, extrasaction='ignore')
+
+            if self._header:
+                rows.writeheader()
+                self._header = False
+
+            for record in records:
+                rows.writerow({k: json.dumps(v) if isinstance(v, (dict, list)) else v for k, v in record.items()})
+        elif self._format != 'csv':
+            for record in records:
+                buffer.write(json.dumps(record, separators=(',', ':')) + '\n')
+
+        text = buffer.getvalue()
+
+        self._file.write(text)
+        self._file.flush()
+        self.size += len(text.encode('utf-8'))
+
+    def close(self):
+        self._file.close()
+
+        if self._part is not None:
+            _merge_part(self._part, self._path)
+
+
+def _merge_part(part, path):
+    with open(part, 'rb') as source, open(path, 'ab') as target:
+        while True:
+            chunk = source.read(1024 * 1024)
+
+            if not chunk:
+                break
+
+            target.write(chunk)
+
+    os.remove(part)
+
+
+def _recover_part(part, path, size):
+    # Every write flushes the compressor, so a killed run keeps all flushed pages
+    # readable, but only the first size bytes were saved in state
+    with open(part, 'rb') as file:
+        text = zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(file.read())[:size]
+
+    if len(text) > 0:
+        with gzip.open(path, 'ab') as file:
+            file.write(text)
+
+    os.remove(part)
+    _log(f"[I] Recovered {len(text)} bytes from {part} left by an interrupted run")
+
+
+def _load_state(path):
+    if not os.path.exists(path):
+        return {}
+
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def _save_state(path, state):
+    with open(f"{path}.tmp", 'w', encoding='utf-8') as file:
+        json.dump(state, file)
+
+    os.replace(f"{path}.tmp", path)
+
+
+def _detect_format(path, _format):
+    if _format is not None:
+        return _format
+
+    name = path[:-3] if path.endswith('.gz') else path
+
+    return 'csv' if name.endswith('.csv') else 'ndjson'
+
+
+def _log(message):
+    print(message, file=sys.stderr)
+
+
+def _record_id(record):
+    # Deposits, withdrawals and rewards are identified by uuid
+    return record.get('uuid', record.get('id'))
+
+
+def _newer(record, bound):
+    # A bound is the created time of a record and the ids seen in that second
+    if bound is None:
+        return True
+
+    timestamp = int(record['created_at'])
+
+    return timestamp > bound['timestamp'] or \
+        (timestamp == bound['timestamp'] and _record_id(record) not in bound['seen'])
+
+
+def _older(record, bound):
+    if bound is None:
+        return True
+
+    timestamp = int(record['created_at'])
+
+    return timestamp < bound['timestamp'] or \
+        (timestamp == bound['timestamp'] and _record_id(record) not in bound['seen'])
+
+
+def _extend(bound, record):
+    timestamp = int(record['created_at'])
+
+    if bound is None or bound['timestamp'] != timestamp:
+        return {'timestamp': timestamp, 'seen': [_record_id(record)]}
+
+    return {'timestamp': timestamp, 'seen': bound['seen'] + [_record_id(record)]}
+
+
+def _cursor(records, state, newest_first):
+    # Advance the cursor to the last exported record, and return the records not exported yet
+    if newest_first:
+        run = state['run']
+        fresh = [r for r in records if _newer(r, state.get('newest')) and _older(r, run['cursor'])]
+
+        for record in fresh:
+            run['cursor'] = _extend(run['cursor'], record)
+
+            if run['newest'] is None or run['newest']['timestamp'] == int(record['created_at']):
+                run['newest'] = _extend(run['newest'], record)
+    else:
+        last_id = state.get('id')
+        fresh = [r for r in records if last_id is None or int(r['id']) > last_id]
+
+        if len(fresh) > 0:
+            state['id'] = int(fresh[-1]['id'])
+
+    return fresh
+
+
+def _finish(state, newest_first):
+    # Newest first exports remember the newest record exported, the next run fetches records after it
+    if newest_first:
+        run = state.pop('run')
+        newest = state.get('newest')
+
+        if run['newest'] is None:
+            return
+        if newest is not None and newest['timestamp'] == run['newest']['timestamp']:
+            state['newest'] = {'timestamp': newest['timestamp'], 'seen': newest['seen'] + run['newest']['seen']}
+        else:
+            state['newest'] = run['newest']
+
+
+def export_pages(client, args, writer, state, limiter):
+    """
+    Fetch pages concurrently in batches of workers, and write them in order,
+    the state keeps the last written record (the id of ascending exports, or
+    the created time of newest first ones) and is saved after every page, so
+    an interrupted export resumes after that record however pages shifted
+
+    Newest first exports walk down from the time a run started to the newest
+    record of the previous run, so running the same command again appends
+    the records created since then
+    """
+
+    fetch, _, newest_first = EXPORTS[args.resource]
+    count = state.get('count', 0)
+
+    if newest_first and 'run' not in state:
+        state['run'] = {'to': int(_time()), 'cursor': None, 'newest': None}
+
+    # Pages are counted from the last written record, and newest first exports
+    # are pinned to the time before it, so new records could not shift pages
+    cursor = dict(state)
+
+    if newest_first:
+        run = state['run']
+        cursor['to'] = run['cursor']['timestamp'] + 1 if run['cursor'] is not None else run['to']
+        cursor['from'] = state['newest']['timestamp'] if 'newest' in state else ''
+
+    def _fetch(number):
+        limiter.acquire()
+        return fetch(client, args, cursor, number, args.limit)
+
+    page = 1
+
+    with ThreadPoolExecutor(args.workers) as executor:
+        while True:
+            pages = range(page, page + args.workers)
+
+            for records in executor.map(_fetch, pages):
+                fresh = _cursor(records, state, newest_first)
+
+                writer.write(fresh)
+                count += len(fresh)
+
+                if len(records) < args.limit:
+                    _finish(state, newest_first)
+
+                state.update({'count': count, 'columns': writer.columns, 'size': writer.size})
+                _save_state(args.state, state)
+
+                if len(records) < args.limit:
+                    return count
+
+            page += args.workers
+            _log(f"[I] Exported {count} {args.resource}")
+
+
+def export_kline(client, args, writer, state, limiter):
+    """
+    Fetch windows of k lines concurrently from the start timestamp, the state
+    keeps the next timestamp to fetch so an interrupted export resumes there
+    """
+
+    step = args.limit * args.period * 60
+    start = state.get('timestamp', args.start)
+    end = args.end if args.end is not None else int(_time())
+    count = state.get('count', 0)
+
+    def _fetch(timestamp):
+        limiter.acquire()
+        return timestamp, client.get_public_k_line(args.pair, args.limit, args.period, timestamp)
+
+    with ThreadPoolExecutor(args.workers) as executor:
+        while start < end:
+            windows = range(start, min(end, start + step * args.workers), step)
+
+            for timestamp, rows in executor.map(_fetch, windows):
+                rows = [dict(zip(KLINE_FIELDS, row)) for row in rows
+                        if timestamp <= row[0] < min(end, timestamp + step)]
+
+                writer.write(rows)
+                count += len(rows)
+
+                state.update({'timestamp': timestamp + step, 'count': count, 'columns': writer.columns,
+                              'size': writer.size})
+                _save_state(args.state, state)
+
+            start = windows[-1] + step
+            _log(f"[I] Exported {count} k lines until {min(start, end)}")
+
+    return count
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m max', description='MAX exchange API v2 tools')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export = commands.add_parser('export', help='export history records to NDJSON or CSV files')
+    export.add_argument('resource', choices=sorted(list(EXPORTS) + ['kline']))
+    export.add_argument('output', help='the output file, compressed by gzip if ending with .gz')
+    export.add_argument('--format', choices=('ndjson', 'csv'), help='default is detected by file name')
+    export.add_argument('--pair', default='', help='the trading pair, required by trades, orders and kline')
+    export.add_argument('--currency', default='', help='the specific coin of deposits, withdrawals and rewards')
+    export.add_argument('--limit', type=int, default=None, help='the records limit of each request')
+    export.add_argument('--workers', type=int, default=4, help='the requests sent concurrently')
+    export.add_argument('--rate', type=float, default=None, help='the requests allowed per second')
+    export.add_argument('--period', type=int, default=1, help='the time period of K line in minute')
+    export.add_argument('--start', type=int, default=None, help='the Unix epoch seconds to export K line from')
+    export.add_argument('--end', type=int, default=None, help='the Unix epoch seconds to export K line until')
+    export.add_argument('--state', default=None, help='the resume state file, default is OUTPUT.state')
+    export.add_argument('--restart', action='store_true', help='ignore the resume state and overwrite output')
+    export.add_argument('--key', default=os.environ.get('MAX_API_KEY', ''), help='default is $MAX_API_KEY')
+    export.add_argument('--secret', default=os.environ.get('MAX_API_SECRET', ''), help='default is $MAX_API_SECRET')
+
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    kline = args.resource == 'kline'
+
+    if (kline or EXPORTS[args.resource][1]) and len(args.pair) == 0:
+        parser.error(f"--pair is required to export {args.resource}")
+    if kline and args.start is None:
+        parser.error('--start is required to export kline')
+    if not kline and (len(args.key) == 0 or len(args.secret) == 0):
+        parser.error('API key and secret are required, set --key/--secret or $MAX_API_KEY/$MAX_API_SECRET')
+
+    args.pair = args.pair.lower()
+    args.state = args.state or f"{args.output}.state"
+    args.limit = args.limit or (10000 if kline else 100)
+
+    if args.restart:
+        for path in (args.output, args.state, f"{args.output}.part"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    if args.rate is not None:
+        limiter = TokenBucket(args.rate, 1)
+    elif kline:
+        limiter = TokenBucket(PUBLIC_RATE_LIMIT, PUBLIC_RATE_PERIOD)
+    else:
+        limiter = TokenBucket(PRIVATE_RATE_LIMIT, PRIVATE_RATE_PERIOD)
+
+    state = _load_state(args.state)
+    client = Client(args.key, args.secret)
+    writer = Writer(args.output, _detect_format(args.output, args.format), state.get('columns'), state.get('size'))
+
+    if len(state) > 0:
+        _log(f"[I] Resume exporting {args.resource} after {state.get('count', 0)} records")
+
+        # The size of a recovered part is covered by the output now
+        state['size'] = writer.size
+        _save_state(args.state, state)
+
+    try:
+        if kline:
+            count = export_kline(client, args, writer, state, limiter)
+        else:
+            count = export_pages(client, args, writer, state, limiter)
+    except KeyboardInterrupt:
+        _log("[X] Interrupted, run the same command again to resume")
+        return 130
+    except Exception as error:
+        _log(f"[X] Exception: {str(error)}")
+
+        # Networking errors occurred here
+        response = getattr(error, 'read', None)
+        if callable(response):
+            _log(f"[X] Reason: {response().decode('utf-8')}")
+
+        return 1
+    finally:
+        writer.close()
+
+    _log(f"[I] Exported {count} {args.resource} into {args.output}")
+
+    return 0
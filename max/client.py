@@ -1,53 +1,63 @@
 #!/usr/bin/env python3
 
-import base64
-import hashlib
-import hmac
 import json
 
-from urllib.parse import urlencode
+from time import monotonic as _monotonic
 from urllib.request import Request
-from urllib.request import urlopen
 
-from .constants import *
-from .helpers import *
+from .builder import build_url
+from .constants import PRIVATE_API_VERSION
+from .helpers import NonceGenerator
+from .transport import Transport
 
 
 class Client(object):
-    def __init__(self, key, secret, timeout=30):
+    def __init__(self, key, secret, timeout=30, transport=None, nonce=None, health=None):
         self._api_key = key
         self._api_secret = secret
+        self._api_secret_bytes = bytes(secret, 'utf-8')
 
         self._api_timeout = int(timeout)
 
+        # Share one nonce source between all clients of the same API key
+        self._nonce = nonce if nonce is not None else NonceGenerator()
+
+        # Swap it with RecordingTransport or ReplayTransport for offline runs
+        self._transport = transport if transport is not None else Transport()
+
+        # Fail fast and adapt timeouts by a HealthTracker (optional)
+        self._health = health
+
     def _build_body(self, endpoint, query=None):
         if query is None:
             query = {}
 
-        # TODO: duplicated nonce may occurred in high frequency trading
-        # fix it by yourself, hard code last two characters is a quick solution
-        # {"error":{"code":2006,"message":"The nonce has already been used by access key."}}
         body = {
             'path': f"/api/{PRIVATE_API_VERSION}/{endpoint}.json",
-            'nonce': get_current_timestamp(),
+            'nonce': self._nonce(),
         }
 
         body.update(query)
 
         return body
 
-    def _build_headers(self, scope, body=None):
+    def _build_headers(self, scope, body=None, serialized=None):
         if body is None:
             body = {}
 
         headers = {
             'Accept': 'application/json',
+            'Accept-Encoding': 'gzip, deflate',
             'User-Agent': 'pyCryptoTrader/1.0.3',
         }
 
         if scope.lower() == 'private':
-            payload = self._build_payload(body)
-            sign = hmac.new(bytes(self._api_secret, 'utf-8'), bytes(payload, 'utf-8'), hashlib.sha256).hexdigest()
+            # Signing modules are loaded by the first private call only
+            import hashlib
+            import hmac
+
+            payload = self._build_payload(body, serialized)
+            sign = hmac.new(self._api_secret_bytes, payload.encode('utf-8'), hashlib.sha256).hexdigest()
 
             headers.update({
                 # This header is REQUIRED to send JSON data.
@@ -60,58 +70,38 @@ class Client(object):
 
         return headers
 
-    def _build_payload(self, body):
-        return base64.urlsafe_b64encode(json.dumps(body).encode('utf-8')).decode('utf-8')
+    def _build_payload(self, body, serialized=None):
+        import base64
 
-    def _build_url(self, scope, endpoint, body=None, query=None):
-        if query is None:
-            query = {}
+        if serialized is None:
+            serialized = json.dumps(body)
 
-        if body is None:
-            body = {}
+        return base64.urlsafe_b64encode(serialized.encode('utf-8')).decode('utf-8')
 
+    def _build_url(self, scope, endpoint, body=None):
         # 2020-03-03 Updated
         # All query parameters must equal to payload
-        query.update(body)
-
-        if scope.lower() == 'private':
-            url = f"{PRIVATE_API_URL}/{PRIVATE_API_VERSION}/{endpoint}.json"
-        else:
-            url = f"{PUBLIC_API_URL}/{PUBLIC_API_VERSION}/{endpoint}.json"
-
-        return f"{url}?{urlencode(query, True, '/[]')}" if len(query) > 0 else url
-
-    def _send_request(self, scope, method, endpoint, query=None, form=None):
-        if form is None:
-            form = {}
-
-        if query is None:
-            query = {}
+        return build_url(scope, endpoint, body)
 
+    def _send_request(self, scope, method, endpoint, query=None, form=None, stream=False):
         body = self._build_body(endpoint, query)
         data = None
 
-        if len(form) > 0:
+        if form:
             body.update(form)
-            data = json.dumps(body).encode('utf-8')
 
-        # Build X-MAX-PAYLOAD header first
-        headers = self._build_headers(scope, body)
+        # Serialize once for both X-MAX-PAYLOAD header and JSON body
+        serialized = json.dumps(body) if form or scope.lower() == 'private' else None
 
-        # Fix "401 Payload is not consistent .."
-        # state[]=cancel&state[]=wait&state[]=done
-        # {"path": "/api/v2/orders.json", "state": ["cancel", "wait", "done"]}
-        for key in body:
-            if type(body[key]) is list and not key[-2:] == '[]':
-                body[f"{key}[]"] = body.pop(key)
+        if form:
+            data = serialized.encode('utf-8')
 
-                if key in query:
-                    query.pop(key)
+        headers = self._build_headers(scope, body, serialized)
 
-        # Build final url here
-        url = self._build_url(scope, endpoint, body, query)
+        # Build final url here, list fields are encoded as key[] in the same order
+        url = self._build_url(scope, endpoint, body)
 
-        request = Request(headers=headers, method=method.upper(), url=url.lower())
+        request = Request(headers=headers, method=method.upper(), url=url)
 
         # Start: Debugging with BurpSuite only
         # import ssl
@@ -123,9 +113,47 @@ class Client(object):
         """
         # End: Debugging with BurpSuite only
 
-        response = urlopen(request, data=data, timeout=self._api_timeout)
+        health = self._health
+        timeout = self._api_timeout
+
+        if health is not None:
+            from .health import endpoint_key
+
+            key = endpoint_key(method, endpoint, query)
+            # Only idempotent calls are cut short, a timed out order could still be placed
+            timeout = health.acquire(key, timeout, method.upper() == 'GET')
+            started = _monotonic()
+
+        try:
+            if stream:
+                # Caching reads the whole body, which defeats streaming
+                response = self._transport.send(request, data, timeout, cache=False)
+            else:
+                response = self._transport.send(request, data, timeout)
+        except Exception as error:
+            if health is not None:
+                health.record(key, _monotonic() - started, error)
+
+            raise
+
+        if health is not None:
+            health.record(key, _monotonic() - started)
+
+        if stream:
+            return self._stream_response(response)
+
+        try:
+            return json.loads(response.read())
+        finally:
+            response.close()
+
+    def _stream_response(self, response):
+        from .stream import iter_json_array
 
-        return json.loads(response.read())
+        try:
+            yield from iter_json_array(response)
+        finally:
+            response.close()
 
     # Public API
     def get_public_all_currencies(self):
@@ -159,7 +187,7 @@ class Client(object):
         else:
             return self._send_request('public', 'GET', 'tickers')
 
-    def get_public_k_line(self, pair, limit=30, period=1, timestamp=''):
+    def get_public_k_line(self, pair, limit=30, period=1, timestamp='', stream=False):
         """
         https://max.maicoin.com/documents/api_list#!/public/getApiV2K
 
@@ -167,6 +195,7 @@ class Client(object):
         :param limit: the data points limit to query
         :param period: the time period of K line in minute
         :param timestamp: the Unix epoch seconds set to return trades executed before the time only
+        :param stream: yield each OHLC price while receiving instead of returning a list
         :return: a list contains all OHLC prices in exchange
         """
 
@@ -177,7 +206,7 @@ class Client(object):
             'timestamp': timestamp
         }
 
-        return self._send_request('public', 'GET', 'k', query)
+        return self._send_request('public', 'GET', 'k', query, stream=stream)
 
     def get_public_markets_summary(self):
         """
@@ -442,7 +471,7 @@ class Client(object):
             return self._send_request('private', 'GET', 'order', {'id': _id})
 
     def get_private_order_history(self, pair, state=None, sort='asc', pagination=True,
-                                  page=1, limit=100, offset=0, group_id=''):
+                                  page=1, limit=100, offset=0, group_id='', stream=False):
         """
         https://max.maicoin.com/documents/api_list#!/private/getApiV2Orders
 
@@ -454,6 +483,7 @@ class Client(object):
         :param limit: the orders limit to query
         :param offset: the records to skip, not applied for pagination
         :param group_id: a integer group id for orders
+        :param stream: yield each order while receiving instead of returning a list
         :return: a list contains all placed orders
         """
 
@@ -476,7 +506,7 @@ class Client(object):
         if group_id is not None and type(group_id) is int:
             query['group_id'] = group_id
 
-        return self._send_request('private', 'GET', 'orders', query)
+        return self._send_request('private', 'GET', 'orders', query, stream=stream)
 
     def get_private_reward_history(self, currency='', _from='', to='', _type='',
                                    pagination=False, page=1, limit=50, offset=0):
@@ -513,7 +543,7 @@ class Client(object):
 
     def get_private_trade_history(self, pair, timestamp='', _from='',
                                   to='', sort='desc', pagination=True,
-                                  page=1, limit=50, offset=0):
+                                  page=1, limit=50, offset=0, stream=False):
         """
         https://max.maicoin.com/documents/api_list#!/private/getApiV2TradesMy
 
@@ -526,6 +556,7 @@ class Client(object):
         :param page: the page number applied for pagination
         :param limit: the records limit to query
         :param offset: the records to skip, not applied for pagination
+        :param stream: yield each trade while receiving instead of returning a list
         :return: a list contains all completed trades
         """
 
@@ -541,7 +572,7 @@ class Client(object):
             'offset': offset
         }
 
-        return self._send_request('private', 'GET', 'trades/my', query)
+        return self._send_request('private', 'GET', 'trades/my', query, stream=stream)
 
     def get_private_transfer_detail(self, _id):
         """
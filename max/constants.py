@@ -6,3 +6,10 @@ PRIVATE_API_URL = 'https://max-api.maicoin.com/api'
 PUBLIC_API_VERSION = 'v2'
 PRIVATE_API_VERSION = 'v2'
 
+# Default request budget of one API key, calls per period in seconds
+PRIVATE_RATE_LIMIT = 100
+PRIVATE_RATE_PERIOD = 15
+
+# Default request budget of public endpoints from one IP
+PUBLIC_RATE_LIMIT = 1200
+PUBLIC_RATE_PERIOD = 60
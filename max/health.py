@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+
+import threading
+
+from collections import deque
+from socket import timeout as _socket_timeout
+from time import monotonic as _monotonic
+from urllib.error import HTTPError
+from urllib.error import URLError
+
+# States of circuit breaker
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised without sending the request while an endpoint is unhealthy
+    """
+
+    def __init__(self, endpoint, retry_after):
+        super().__init__(f"circuit of {endpoint} is open, retry after {retry_after:.1f} seconds")
+
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+def is_failure(error):
+    """
+    :param error: the exception raised by transport
+    :return: True if the error means the endpoint is unhealthy, not the request is invalid
+    """
+
+    if isinstance(error, HTTPError):
+        return error.code >= 500 or error.code == 429
+
+    return isinstance(error, (URLError, OSError))
+
+
+def is_timeout(error):
+    """
+    :param error: the exception raised by transport
+    :return: True if the call was given up by timeout
+    """
+
+    if isinstance(error, URLError):
+        error = error.reason
+
+    return isinstance(error, (_socket_timeout, TimeoutError))
+
+
+def endpoint_key(method, endpoint, query=None):
+    """
+    :return: the name to track a call by, calls with a limit are grouped by its
+             power of two, so large requests would not set the timeout of small ones
+    """
+
+    key = f"{method.upper()} {endpoint}"
+    limit = query.get('limit') if query else None
+
+    if isinstance(limit, int) and limit > 0:
+        key = f"{key} limit<={1 << (limit - 1).bit_length()}"
+
+    return key
+
+
+def _percentile(values, percent):
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+class EndpointHealth(object):
+    """
+    Rolling calls of one endpoint and its circuit breaker
+
+    The circuit opens when the error rate of the window reaches the threshold,
+    after the cooldown one probe call is let through (half open), and its
+    result decides whether the circuit closes or opens again
+    """
+
+    def __init__(self, window=100, min_calls=20, error_rate=0.5, cooldown=30.0):
+        self.state = CLOSED
+
+        # The default timeout of the last call and whether it could be shortened
+        self.timeout = None
+        self.adaptive = True
+
+        self._calls = deque(maxlen=int(window))
+        self._min_calls = int(min_calls)
+        self._error_rate = float(error_rate)
+        self._cooldown = float(cooldown)
+
+        self._opened = 0.0
+        self._probing = False
+
+    def allow(self, now):
+        """
+        :return: 0 if a call is allowed, or the seconds to wait before retrying
+        """
+
+        if self.state == OPEN:
+            retry_after = self._opened + self._cooldown - now
+
+            if retry_after > 0:
+                return retry_after
+
+            self.state = HALF_OPEN
+
+        if self.state == HALF_OPEN:
+            if self._probing:
+                return self._cooldown
+
+            self._probing = True
+
+        return 0
+
+    def record(self, now, latency, failed, timed_out=False):
+        self._calls.append((latency, failed, timed_out))
+
+        if self.state == HALF_OPEN:
+            self._probing = False
+
+            if failed:
+                self.state = OPEN
+                self._opened = now
+            else:
+                self.state = CLOSED
+                self._calls.clear()
+                self._calls.append((latency, failed, timed_out))
+        elif self.state == CLOSED and len(self._calls) >= self._min_calls and self.error_rate >= self._error_rate:
+            self.state = OPEN
+            self._opened = now
+
+    @property
+    def error_rate(self):
+        if len(self._calls) == 0:
+            return 0.0
+
+        return sum(1 for _, failed, _ in self._calls if failed) / len(self._calls)
+
+    def latencies(self):
+        """
+        :return: a sorted list of latencies of succeeded and timed out calls in the window,
+                 so timeouts raise the percentiles instead of being ignored
+        """
+
+        return sorted(latency for latency, failed, timed_out in self._calls if not failed or timed_out)
+
+    def status(self, now):
+        latencies = self.latencies()
+        status = {
+            'state': self.state,
+            'calls': len(self._calls),
+            'error_rate': self.error_rate,
+            'retry_after': max(0.0, self._opened + self._cooldown - now) if self.state == OPEN else 0.0,
+        }
+
+        for percent in (50, 90, 99):
+            status[f"p{percent}"] = _percentile(latencies, percent) if len(latencies) > 0 else None
+
+        return status
+
+
+class HealthTracker(object):
+    """
+    Track latency and errors of every endpoint, fail fast with CircuitOpenError
+    while one is unhealthy, and derive per-call timeouts from observed latency
+
+    Calls are tracked by endpoint_key(), e.g. 'GET k limit<=32', and a timed
+    out call counts as a latency of its elapsed time, so the timeout grows
+    back when the endpoint slows down, only GET calls are given the adaptive
+    timeout, while every call fails fast on an open circuit
+
+    >>> health = HealthTracker()
+    >>> client = Client(key, secret, health=health)
+    >>> health.status()
+    {'GET tickers': {'state': 'closed', 'calls': 12, 'error_rate': 0.0, 'p50': 0.08, ...}}
+    """
+
+    def __init__(self, window=100, min_calls=20, error_rate=0.5, cooldown=30.0,
+                 timeout_factor=4.0, min_timeout=1.0):
+        """
+        :param window: the latest calls kept for each endpoint
+        :param min_calls: the calls required before opening circuit or adapting timeout
+        :param error_rate: the ratio of failed calls to open circuit
+        :param cooldown: the seconds to fail fast before probing an open circuit
+        :param timeout_factor: the multiple of p99 latency used as timeout
+        :param min_timeout: the shortest timeout in seconds
+        """
+
+        self._options = {'window': window, 'min_calls': min_calls, 'error_rate': error_rate, 'cooldown': cooldown}
+        self._min_calls = int(min_calls)
+        self._timeout_factor = float(timeout_factor)
+        self._min_timeout = float(min_timeout)
+
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def _get(self, endpoint):
+        health = self._endpoints.get(endpoint)
+
+        if health is None:
+            health = self._endpoints[endpoint] = EndpointHealth(**self._options)
+
+        return health
+
+    def acquire(self, endpoint, timeout, adaptive=True):
+        """
+        :param endpoint: the endpoint to call
+        :param timeout: the default timeout in seconds
+        :param adaptive: shorten the timeout by observed latency, it should be False
+                         for calls unsafe to retry (e.g. placing orders), since a call
+                         cut by timeout may still have been done by the exchange
+        :return: the timeout for this call, no longer than the default one
+        """
+
+        with self._lock:
+            health = self._get(endpoint)
+            retry_after = health.allow(_monotonic())
+
+            if retry_after > 0:
+                raise CircuitOpenError(endpoint, retry_after)
+
+            health.timeout = timeout
+            health.adaptive = adaptive
+
+            if not adaptive:
+                return timeout
+
+            latencies = health.latencies()
+
+        return self._timeout(latencies, timeout)
+
+    def _timeout(self, latencies, timeout):
+        if len(latencies) < self._min_calls:
+            return timeout
+
+        adaptive = max(self._min_timeout, _percentile(latencies, 99) * self._timeout_factor)
+
+        return adaptive if timeout is None else min(timeout, adaptive)
+
+    def record(self, endpoint, latency, error=None):
+        """
+        :param endpoint: the endpoint called
+        :param latency: the seconds until the response arrived
+        :param error: the exception raised by the call (optional)
+        """
+
+        with self._lock:
+            self._get(endpoint).record(_monotonic(), latency, error is not None and is_failure(error),
+                                       error is not None and is_timeout(error))
+
+    def status(self):
+        """
+        :return: a dict maps endpoints to their state, error rate, latency percentiles and
+                 the timeout acquire() gives with the default timeout of the last call
+        """
+
+        now = _monotonic()
+        status = {}
+
+        with self._lock:
+            for endpoint, health in self._endpoints.items():
+                status[endpoint] = health.status(now)
+                status[endpoint]['timeout'] = self._timeout(health.latencies(), health.timeout) \
+                    if health.adaptive else health.timeout
+
+        return status
+
+    def reset(self, endpoint=None):
+        with self._lock:
+            if endpoint is None:
+                self._endpoints.clear()
+            else:
+                self._endpoints.pop(endpoint, None)
@@ -1,7 +1,79 @@
 #!/usr/bin/env python3
 
+import threading
+
+from time import monotonic as _monotonic
+from time import sleep as _sleep
 from time import time as _time
 
 
 def get_current_timestamp():
     return int(round(_time() * 1000))
+
+
+class NonceGenerator(object):
+    """
+    A thread-safe nonce source for one API key, every nonce is the current
+    timestamp in milliseconds but always greater than the last one, to avoid
+    {"error":{"code":2006,"message":"The nonce has already been used by access key."}}
+
+    Processes sharing one API key should use the same stride and different
+    offsets, so their nonces never collide, e.g. offset 0 and 1 of stride 2
+    """
+
+    def __init__(self, offset=0, stride=1):
+        if not 0 <= offset < stride:
+            raise ValueError('offset must be in range of [0, stride)')
+
+        self._offset = int(offset)
+        self._stride = int(stride)
+
+        self._last = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            nonce = max(get_current_timestamp(), self._last + 1)
+            self._last = nonce + (self._offset - nonce) % self._stride
+
+            return self._last
+
+
+class TokenBucket(object):
+    """
+    A thread-safe token bucket allows `rate` calls in every `period` seconds
+    """
+
+    def __init__(self, rate, period=1.0):
+        self._capacity = float(rate)
+        self._tokens = float(rate)
+        self._refill = float(rate) / float(period)
+
+        self._updated = _monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        """
+        :return: 0 if a token is taken, or the seconds to wait for next token
+        """
+
+        with self._lock:
+            now = _monotonic()
+
+            self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._refill)
+            self._updated = now
+
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+
+            return (1 - self._tokens) / self._refill
+
+    def acquire(self):
+        while True:
+            delay = self.try_acquire()
+
+            if delay == 0:
+                return
+
+            _sleep(delay)
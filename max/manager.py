@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+
+import threading
+
+from collections import OrderedDict
+from collections import deque
+from concurrent.futures import Future
+from concurrent.futures import wait
+
+from .client import Client
+from .constants import PRIVATE_RATE_LIMIT
+from .constants import PRIVATE_RATE_PERIOD
+from .helpers import NonceGenerator
+from .helpers import TokenBucket
+from .transport import PooledTransport
+
+
+class ClientManager(object):
+    """
+    Host many accounts over one pooled transport, every account has its own
+    client, and accounts of the same API key share one nonce source and rate
+    limit bucket, as the exchange limits and checks nonces by API key
+
+    Calls are queued per account and dispatched to the workers round-robin,
+    so a busy account could not starve the others, and an account is skipped
+    while its bucket is empty
+
+    >>> manager = ClientManager()
+    >>> manager.add('alice', 'ALICE_KEY', 'ALICE_SECRET')
+    >>> manager.add('bob', 'BOB_KEY', 'BOB_SECRET')
+    >>> manager.get_all_balances()
+    {'alice': [..], 'bob': [..]}
+    """
+
+    def __init__(self, workers=8, timeout=30, transport=None,
+                 rate=PRIVATE_RATE_LIMIT, period=PRIVATE_RATE_PERIOD):
+        self._timeout = timeout
+        self._transport = transport if transport is not None else PooledTransport(maxsize=workers)
+
+        self._rate = rate
+        self._period = period
+
+        self._clients = OrderedDict()
+        self._nonces = {}
+        self._limits = {}
+        self._key_buckets = {}
+        self._buckets = {}
+        self._queues = {}
+        self._ready = deque()
+
+        self._closed = False
+        self._cond = threading.Condition()
+        self._workers = [threading.Thread(target=self._work, daemon=True) for _ in range(int(workers))]
+
+        for worker in self._workers:
+            worker.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __contains__(self, name):
+        return name in self._clients
+
+    def __len__(self):
+        return len(self._clients)
+
+    @property
+    def names(self):
+        return list(self._clients)
+
+    def add(self, name, key, secret, rate=None, period=None):
+        """
+        :param name: a unique name of the account
+        :param key: the API key of the account
+        :param secret: the API secret of the account
+        :param rate: the calls allowed in each period (optional)
+        :param period: the period of rate limit in seconds (optional)
+        :return: the client of the account
+        :raise ValueError: if the name exists, or the rate limit differs from
+                           the one of another account with the same key
+        """
+
+        limit = (rate or self._rate, period or self._period)
+
+        with self._cond:
+            if name in self._clients:
+                raise ValueError(f"account {name} already exists")
+
+            if self._limits.setdefault(key, limit) != limit:
+                rate, period = self._limits[key]
+                raise ValueError(f"account {name} sets rate limit {limit[0]}/{limit[1]}s, "
+                                 f"but its API key is limited to {rate}/{period}s")
+
+            nonce = self._nonces.setdefault(key, NonceGenerator())
+            client = Client(key, secret, self._timeout, self._transport, nonce=nonce)
+
+            if key not in self._key_buckets:
+                self._key_buckets[key] = TokenBucket(*limit)
+
+            self._clients[name] = client
+            self._buckets[name] = self._key_buckets[key]
+            self._queues[name] = deque()
+
+        return client
+
+    def remove(self, name):
+        with self._cond:
+            self._clients.pop(name)
+            self._buckets.pop(name)
+
+            if name in self._ready:
+                self._ready.remove(name)
+
+            for future, _, _, _ in self._queues.pop(name):
+                future.cancel()
+
+    def get(self, name):
+        return self._clients[name]
+
+    def submit(self, name, method, *args, **kwargs):
+        """
+        :param name: the account to invoke the API with
+        :param method: the method name of Client, e.g. 'get_private_account_balances'
+        :return: a concurrent.futures.Future of the API result
+        """
+
+        future = Future()
+
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('manager has been closed')
+
+            queue = self._queues[name]
+
+            if len(queue) == 0:
+                self._ready.append(name)
+
+            queue.append((future, getattr(self._clients[name], method), args, kwargs))
+            self._cond.notify()
+
+        return future
+
+    def map(self, method, *args, names=None, **kwargs):
+        """
+        Invoke the same API for many accounts concurrently
+
+        :param method: the method name of Client
+        :param names: the accounts to invoke, default is all accounts
+        :return: a dict maps account names to results, or exceptions on failure
+        """
+
+        futures = OrderedDict((name, self.submit(name, method, *args, **kwargs))
+                              for name in (names if names is not None else self.names))
+        wait(futures.values())
+
+        return OrderedDict((name, future.exception() or future.result()) for name, future in futures.items())
+
+    def get_all_balances(self, names=None):
+        return self.map('get_private_account_balances', names=names)
+
+    def get_all_open_orders(self, pair, names=None):
+        return self.map('get_private_order_history', pair, names=names)
+
+    def set_all_cancel_orders(self, pair='', side='', names=None):
+        return self.map('set_private_cancel_orders', pair, side, names=names)
+
+    def _next(self):
+        # Called with lock held, returns the next runnable task or seconds to wait
+        delay = None
+
+        for _ in range(len(self._ready)):
+            name = self._ready.popleft()
+            wait_for = self._buckets[name].try_acquire()
+
+            if wait_for == 0:
+                queue = self._queues[name]
+                task = queue.popleft()
+
+                if len(queue) > 0:
+                    self._ready.append(name)
+
+                return task, None
+
+            self._ready.append(name)
+            delay = wait_for if delay is None else min(delay, wait_for)
+
+        return None, delay
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        return
+
+                    task, delay = self._next()
+
+                    if task is not None:
+                        break
+
+                    self._cond.wait(delay)
+
+            future, func, args, kwargs = task
+
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            try:
+                future.set_result(func(*args, **kwargs))
+            except BaseException as error:
+                future.set_exception(error)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+
+            for queue in self._queues.values():
+                for future, _, _, _ in queue:
+                    future.cancel()
+
+                queue.clear()
+
+            self._ready.clear()
+            self._cond.notify_all()
+
+        for worker in self._workers:
+            if worker is not threading.current_thread():
+                worker.join()
+
+        self._transport.close()
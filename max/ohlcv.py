@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+
+from array import array
+
+
+class Bars(object):
+    """
+    A ring buffer keeps the latest `capacity` OHLCV bars of one period,
+    adding a trade costs O(1) and periods without trades become flat bars
+    """
+
+    def __init__(self, period, capacity=500):
+        self.period = int(period)
+        self.capacity = int(capacity)
+
+        self._start = array('q', [0]) * self.capacity
+        self._open = array('d', [0.0]) * self.capacity
+        self._high = array('d', [0.0]) * self.capacity
+        self._low = array('d', [0.0]) * self.capacity
+        self._close = array('d', [0.0]) * self.capacity
+        self._volume = array('d', [0.0]) * self.capacity
+        self._turnover = array('d', [0.0]) * self.capacity
+
+        self._head = -1
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def add(self, timestamp, price, volume):
+        """
+        :param timestamp: the Unix epoch seconds of the trade
+        :param price: the price of the trade
+        :param volume: the volume of the trade
+        """
+
+        start = int(timestamp) - int(timestamp) % self.period
+
+        if self._count == 0:
+            self._open_bar(start, price)
+        elif start > self._start[self._head]:
+            last = self._start[self._head]
+            close = self._close[self._head]
+
+            # Fill the quiet periods with flat bars, at most a full buffer
+            for gap in range(max(1, (start - last) // self.period - self.capacity), (start - last) // self.period):
+                self._open_bar(last + gap * self.period, close)
+
+            self._open_bar(start, price)
+
+        i = self._head - (self._start[self._head] - start) // self.period
+
+        # A late trade older than the whole buffer is dropped
+        if i <= self._head - self._count:
+            return
+
+        i %= self.capacity
+
+        if start == self._start[self._head]:
+            self._close[i] = price
+
+        if price > self._high[i]:
+            self._high[i] = price
+        if price < self._low[i]:
+            self._low[i] = price
+
+        self._volume[i] += volume
+        self._turnover[i] += price * volume
+
+    def _open_bar(self, start, price):
+        self._head = (self._head + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+        i = self._head
+
+        self._start[i] = start
+        self._open[i] = self._high[i] = self._low[i] = self._close[i] = price
+        self._volume[i] = self._turnover[i] = 0.0
+
+    def _bar(self, i):
+        volume = self._volume[i]
+        vwap = self._turnover[i] / volume if volume > 0 else self._close[i]
+
+        return self._start[i], self._open[i], self._high[i], self._low[i], self._close[i], volume, vwap
+
+    def latest(self):
+        """
+        :return: a tuple of (start, open, high, low, close, volume, vwap), or None
+        """
+
+        return self._bar(self._head) if self._count > 0 else None
+
+    def snapshot(self, limit=None):
+        """
+        :param limit: the latest bars limit to return, default is all bars
+        :return: a list contains (start, open, high, low, close, volume, vwap) from old to new
+        """
+
+        n = self._count if limit is None else min(int(limit), self._count)
+
+        return [self._bar((self._head - j) % self.capacity) for j in range(n - 1, -1, -1)]
+
+
+class TradeAggregator(object):
+    """
+    Build rolling OHLCV and VWAP bars of several periods at once from trades
+    of get_public_recent_trades, trades are deduplicated by their ids
+
+    >>> aggregator = TradeAggregator('maxtwd', periods=(15, 60, 300))
+    >>> aggregator.poll(client)
+    >>> aggregator.snapshot(60, 10)
+    """
+
+    def __init__(self, pair, periods=(60, 300, 900), capacity=500):
+        """
+        :param pair: the trading pair to aggregate
+        :param periods: the periods of bars in seconds
+        :param capacity: the bars to keep for each period
+        """
+
+        self.pair = pair.lower()
+        self.last_id = None
+
+        self._bars = {int(period): Bars(period, capacity) for period in periods}
+
+    @property
+    def periods(self):
+        return tuple(self._bars)
+
+    def update(self, trades):
+        """
+        :param trades: a list of trades in any order, the seen ones are skipped
+        :return: the number of new trades
+        """
+
+        last_id = self.last_id if self.last_id is not None else -1
+        trades = sorted((t for t in trades if int(t['id']) > last_id), key=lambda t: int(t['id']))
+        bars = tuple(self._bars.values())
+
+        for trade in trades:
+            if trade.get('created_at_in_ms'):
+                timestamp = int(trade['created_at_in_ms']) // 1000
+            else:
+                timestamp = int(trade['created_at'])
+
+            price = float(trade['price'])
+            volume = float(trade['volume'])
+
+            for bar in bars:
+                bar.add(timestamp, price, volume)
+
+        if len(trades) > 0:
+            self.last_id = int(trades[-1]['id'])
+
+        return len(trades)
+
+    def poll(self, client, limit=1000):
+        """
+        Fetch trades after the last seen one and aggregate them
+
+        :param client: the client to fetch trades with
+        :param limit: the records limit to query
+        :return: the number of new trades
+        """
+
+        if self.last_id is None:
+            trades = client.get_public_recent_trades(self.pair, limit=limit)
+        else:
+            trades = client.get_public_recent_trades(self.pair, _from=self.last_id, sort='asc', limit=limit)
+
+        return self.update(trades)
+
+    def latest(self, period):
+        return self._bars[int(period)].latest()
+
+    def snapshot(self, period, limit=None):
+        """
+        :param period: the period of bars in seconds
+        :param limit: the latest bars limit to return, default is all bars
+        :return: a list contains (start, open, high, low, close, volume, vwap) from old to new
+        """
+
+        return self._bars[int(period)].snapshot(limit)
+
+    def snapshots(self, limit=None):
+        """
+        :return: a dict maps every period to its bars
+        """
+
+        return {period: bars.snapshot(limit) for period, bars in self._bars.items()}
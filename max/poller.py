@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+
+import threading
+
+from time import monotonic as _monotonic
+
+from .constants import PUBLIC_RATE_LIMIT
+from .constants import PUBLIC_RATE_PERIOD
+from .helpers import TokenBucket
+
+
+class TickerPoller(object):
+    """
+    Poll all tickers (or the markets summary) once per interval for many
+    consumers, and notify subscribers only for pairs whose fields changed
+
+    The latest snapshot keeps one tuple of values per pair in the order of
+    `fields`, the interval shrinks while markets are moving and grows while
+    they are quiet, and every poll takes a token from the rate limiter
+
+    >>> poller = TickerPoller(client)
+    >>> poller.subscribe(lambda pair, ticker, changed: print(pair, changed), pairs=['btctwd'])
+    >>> poller.start()
+    """
+
+    def __init__(self, client, source='tickers', interval=1.0, min_interval=0.5, max_interval=10.0,
+                 limiter=None, ignore=('at',), on_error=None):
+        """
+        :param client: the client to poll with
+        :param source: 'tickers' for get_public_all_tickers or 'summary' for get_public_markets_summary
+        :param interval: the initial seconds between polls
+        :param min_interval: the shortest seconds between polls when markets are active
+        :param max_interval: the longest seconds between polls when markets are quiet
+        :param limiter: a TokenBucket shared with other consumers of public endpoints (optional)
+        :param ignore: the fields not considered as changes, e.g. 'at' changes on every poll
+        :param on_error: a callback receives exceptions raised while polling (optional)
+        """
+
+        if source not in ('tickers', 'summary'):
+            raise ValueError("source should only be 'tickers' or 'summary'")
+
+        self._client = client
+        self._source = source
+
+        self._min_interval = float(min_interval)
+        self._max_interval = float(max_interval)
+        self._interval = min(max(float(interval), self._min_interval), self._max_interval)
+
+        self._limiter = limiter if limiter is not None else TokenBucket(PUBLIC_RATE_LIMIT, PUBLIC_RATE_PERIOD)
+        self._ignore = frozenset(ignore or ())
+        self._on_error = on_error
+
+        self._fields = ()
+        self._snapshot = {}
+        self._updated = None
+
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    @property
+    def fields(self):
+        return self._fields
+
+    @property
+    def interval(self):
+        return self._interval
+
+    @property
+    def updated(self):
+        """
+        :return: the monotonic time of last successful poll, or None
+        """
+
+        return self._updated
+
+    def get(self, pair):
+        """
+        :param pair: the trading pair to query
+        :return: a dict contains the latest ticker of the pair, or None
+        """
+
+        values = self._snapshot.get(pair.lower())
+
+        return dict(zip(self._fields, values)) if values is not None else None
+
+    def snapshot(self):
+        """
+        :return: a dict maps all pairs to their latest tickers
+        """
+
+        fields, snapshot = self._fields, self._snapshot
+
+        return {pair: dict(zip(fields, values)) for pair, values in snapshot.items()}
+
+    def subscribe(self, callback, pairs=None):
+        """
+        :param callback: a function called with (pair, ticker, changed fields) on changes
+        :param pairs: the trading pairs to watch, default is all pairs
+        """
+
+        pairs = frozenset(pair.lower() for pair in pairs) if pairs is not None else None
+
+        with self._lock:
+            self._subscribers.append((callback, pairs))
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            self._subscribers = [s for s in self._subscribers if s[0] is not callback]
+
+    def poll_once(self):
+        """
+        Fetch once and dispatch changes to subscribers
+
+        :return: a dict maps changed pairs to their changed fields
+        """
+
+        self._limiter.acquire()
+
+        if self._source == 'summary':
+            tickers = self._client.get_public_markets_summary().get('tickers', {})
+        else:
+            tickers = self._client.get_public_all_tickers()
+
+        fields = self._fields
+
+        # Fields are fixed by the first response, a new field resets the layout
+        if any(len(ticker) != len(fields) or any(k not in ticker for k in fields) for ticker in tickers.values()):
+            fields = tuple(sorted({k for ticker in tickers.values() for k in ticker}))
+
+        previous = self._snapshot if fields == self._fields else \
+            {pair: tuple(dict(zip(self._fields, values)).get(k) for k in fields)
+             for pair, values in self._snapshot.items()}
+
+        snapshot = {}
+        changes = {}
+
+        for pair, ticker in tickers.items():
+            values = tuple(ticker.get(k) for k in fields)
+            snapshot[pair] = values
+
+            old = previous.get(pair)
+
+            if old is None:
+                changes[pair] = fields
+            elif old != values:
+                changed = tuple(k for k, a, b in zip(fields, old, values) if a != b and k not in self._ignore)
+
+                if len(changed) > 0:
+                    changes[pair] = changed
+
+        self._fields = fields
+        self._snapshot = snapshot
+        self._updated = _monotonic()
+
+        self._adapt(len(changes))
+        self._dispatch(changes)
+
+        return changes
+
+    def _adapt(self, changes):
+        # Poll faster while pairs are changing, slower while nothing happens
+        if changes > 0:
+            self._interval = max(self._min_interval, self._interval / 2)
+        else:
+            self._interval = min(self._max_interval, self._interval * 1.5)
+
+    def _dispatch(self, changes):
+        with self._lock:
+            subscribers = list(self._subscribers)
+
+        for pair, changed in changes.items():
+            ticker = None
+
+            for callback, pairs in subscribers:
+                if pairs is not None and pair not in pairs:
+                    continue
+
+                if ticker is None:
+                    ticker = dict(zip(self._fields, self._snapshot[pair]))
+
+                try:
+                    callback(pair, ticker, changed)
+                except Exception as error:
+                    self._report(error)
+
+    def _report(self, error):
+        if self._on_error is not None:
+            self._on_error(error)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            started = _monotonic()
+
+            try:
+                self.poll_once()
+            except Exception as error:
+                self._interval = self._max_interval
+                self._report(error)
+
+            self._stopped.wait(max(0.0, self._interval - (_monotonic() - started)))
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+        self._thread = None
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+
+import io
+import itertools
+import multiprocessing
+import pickle
+import threading
+
+from concurrent.futures import Future
+from multiprocessing.connection import wait
+from urllib.error import HTTPError
+
+from .client import Client
+from .helpers import NonceGenerator
+from .transport import PooledTransport
+
+
+def _serve(key, secret, timeout, offset, stride, tasks, results):
+    # Worker process entry, owns a client, a connection pool and a nonce range
+    client = Client(key, secret, timeout, PooledTransport(), NonceGenerator(offset, stride))
+
+    while True:
+        task = tasks.get()
+
+        if task is None:
+            break
+
+        _id, method, args, kwargs = task
+
+        try:
+            results.put((_id, True, getattr(client, method)(*args, **kwargs)))
+        except HTTPError as error:
+            results.put((_id, False, ('http', error.url, error.code, error.msg, error.read())))
+        except Exception as error:
+            try:
+                pickle.dumps(error)
+            except Exception:
+                error = RuntimeError(repr(error))
+
+            results.put((_id, False, error))
+
+    client._transport.close()
+
+
+class ProcessPoolClient(object):
+    """
+    Shard calls of one API key across worker processes, so signing, sending
+    and decoding of orders are not bounded by the GIL of a single process
+
+    Every worker has its own Client and PooledTransport, and the nonce range
+    is split by NonceGenerator(offset=index, stride=processes). Calls are sent
+    to workers round-robin, results and errors flow back through one queue
+    into concurrent.futures.Future objects. If a worker dies (e.g. killed by
+    OOM), its pending calls fail with RuntimeError and the others take over
+
+    >>> with ProcessPoolClient('KEY', 'SECRET', processes=4) as pool:
+    ...     futures = [pool.set_private_create_order('maxtwd', 'sell', 100, 999) for _ in range(8)]
+    ...     orders = [future.result() for future in futures]
+    """
+
+    def __init__(self, key, secret, processes=None, timeout=30):
+        processes = int(processes or multiprocessing.cpu_count())
+        context = multiprocessing.get_context()
+
+        self._ids = itertools.count()
+        self._futures = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+        self._results = context.SimpleQueue()
+        self._tasks = [context.SimpleQueue() for _ in range(processes)]
+        self._alive = list(range(processes))
+        self._turns = itertools.count()
+
+        self._processes = [
+            context.Process(target=_serve, args=(key, secret, timeout, i, processes, self._tasks[i], self._results),
+                            daemon=True)
+            for i in range(processes)
+        ]
+
+        for process in self._processes:
+            process.start()
+
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+        self._collector.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def submit(self, method, *args, **kwargs):
+        """
+        :param method: the method name of Client, e.g. 'set_private_create_order'
+        :return: a concurrent.futures.Future of the API result
+        """
+
+        future = Future()
+        future.set_running_or_notify_cancel()
+
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('pool has been closed')
+            if len(self._alive) == 0:
+                raise RuntimeError('all workers have exited')
+
+            _id = next(self._ids)
+            index = self._alive[next(self._turns) % len(self._alive)]
+            self._futures[_id] = (future, index)
+
+            self._tasks[index].put((_id, method, args, kwargs))
+
+        return future
+
+    def set_private_create_order(self, *args, **kwargs):
+        return self.submit('set_private_create_order', *args, **kwargs)
+
+    def set_private_cancel_order(self, *args, **kwargs):
+        return self.submit('set_private_cancel_order', *args, **kwargs)
+
+    def set_private_cancel_orders(self, *args, **kwargs):
+        return self.submit('set_private_cancel_orders', *args, **kwargs)
+
+    def _collect(self):
+        # Wait for results and exits of workers together, so a dead worker could not hang its calls
+        reader = self._results._reader
+        sentinels = {process.sentinel: i for i, process in enumerate(self._processes)}
+
+        while True:
+            ready = wait([reader] + list(sentinels))
+
+            # Results sent before a worker exited are drained before failing its calls
+            while not self._results.empty():
+                result = self._results.get()
+
+                if result is None:
+                    return
+
+                self._resolve(*result)
+
+            for sentinel in ready:
+                if sentinel in sentinels:
+                    self._fail(sentinels.pop(sentinel))
+
+    def _resolve(self, _id, ok, payload):
+        with self._lock:
+            future, _ = self._futures.pop(_id)
+
+        if ok:
+            future.set_result(payload)
+        elif type(payload) is tuple and payload[0] == 'http':
+            _, url, code, msg, body = payload
+            future.set_exception(HTTPError(url, code, msg, None, io.BytesIO(body)))
+        else:
+            future.set_exception(payload)
+
+    def _fail(self, index):
+        self._processes[index].join()
+
+        with self._lock:
+            self._alive.remove(index)
+            pending = [_id for _id, (_, worker) in self._futures.items() if worker == index]
+            futures = [self._futures.pop(_id)[0] for _id in pending]
+
+        for future in futures:
+            future.set_exception(RuntimeError(f"worker {index} exited before the call finished "
+                                              f"(exit code {self._processes[index].exitcode})"))
+
+    def close(self):
+        """
+        Wait for all submitted calls to finish, then stop the workers
+        """
+
+        with self._lock:
+            if self._closed:
+                return
+
+            self._closed = True
+
+        for tasks in self._tasks:
+            tasks.put(None)
+
+        for process in self._processes:
+            process.join()
+
+        self._results.put(None)
+        self._collector.join()
+
+        for future, _ in self._futures.values():
+            future.set_exception(RuntimeError('worker exited before the call finished'))
+
+        self._futures.clear()
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+
+import json
+import math
+import threading
+
+from array import array
+
+# Quote currencies tried from the end of market name, if markets are not given
+KNOWN_QUOTES = ('usdt', 'usdc', 'twd', 'btc', 'eth')
+
+
+def split_market(market, markets=None):
+    """
+    :param market: the market name, e.g. 'btctwd'
+    :param markets: a dict maps market names to (base, quote) (optional)
+    :return: a tuple of (base, quote) currencies
+    """
+
+    if markets is not None and market in markets:
+        return markets[market]
+
+    for quote in KNOWN_QUOTES:
+        if market.endswith(quote) and len(market) > len(quote):
+            return market[:-len(quote)], quote
+
+    raise ValueError(f"unknown quote currency of market {market}")
+
+
+class Portfolio(object):
+    """
+    Value all balances in one quote currency, keeping amounts, rates and values
+    in flat arrays indexed by currency, so one ticker or balance update only
+    touches the currencies priced by it and reading the total costs nothing
+
+    A currency is priced by its market against the quote currency directly,
+    or through a bridge currency, e.g. 'xrpusdt' and 'usdttwd' for 'twd'
+
+    Updates are serialized by a lock, so tickers could come from the poller
+    thread while balances are refreshed on another one, reads take no lock
+
+    >>> portfolio = Portfolio('twd')
+    >>> portfolio.refresh(client)
+    >>> poller.subscribe(portfolio.on_ticker)
+    >>> portfolio.total
+    """
+
+    def __init__(self, quote='twd', bridges=('usdt', 'btc')):
+        self.quote = quote.lower()
+        self.bridges = tuple(bridge.lower() for bridge in bridges)
+
+        self._index = {}
+        self._currencies = []
+        self._amounts = array('d')
+        self._rates = array('d')
+        self._values = array('d')
+        self._total = 0.0
+
+        self._prices = {}
+        self._routes = []
+        self._dependents = {}
+
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._currencies)
+
+    @property
+    def total(self):
+        return self._total
+
+    def value(self, currency):
+        i = self._index.get(currency.lower())
+
+        return self._values[i] if i is not None else 0.0
+
+    def rate(self, currency):
+        """
+        :return: the price of currency in quote currency, or NaN if unpriced
+        """
+
+        currency = currency.lower()
+
+        if currency == self.quote:
+            return 1.0
+
+        i = self._index.get(currency)
+
+        return self._rates[i] if i is not None else self._price_of(self._route(currency))
+
+    def values(self):
+        """
+        :return: a dict maps currencies to their values in quote currency
+        """
+
+        return dict(zip(self._currencies, self._values))
+
+    def unpriced(self):
+        """
+        :return: a list contains currencies with balance but no price route
+        """
+
+        return [c for i, c in enumerate(self._currencies) if self._amounts[i] != 0 and math.isnan(self._rates[i])]
+
+    def _route(self, currency):
+        # The markets to multiply for the price of currency in quote currency
+        if currency == self.quote:
+            return ()
+        if f"{currency}{self.quote}" in self._prices:
+            return f"{currency}{self.quote}",
+
+        for bridge in self.bridges:
+            if bridge != currency and f"{currency}{bridge}" in self._prices and f"{bridge}{self.quote}" in self._prices:
+                return f"{currency}{bridge}", f"{bridge}{self.quote}"
+
+        return None
+
+    def _price_of(self, route):
+        if route is None:
+            return math.nan
+
+        rate = 1.0
+
+        for pair in route:
+            rate *= self._prices[pair]
+
+        return rate
+
+    def _add_currency(self, currency):
+        i = self._index[currency] = len(self._currencies)
+
+        self._currencies.append(currency)
+        self._amounts.append(0.0)
+        self._rates.append(math.nan)
+        self._values.append(0.0)
+        self._routes.append(None)
+
+        self._reroute(i)
+
+        return i
+
+    def _reroute(self, i):
+        for pair in self._routes[i] or ():
+            self._dependents[pair].discard(i)
+
+        route = self._routes[i] = self._route(self._currencies[i])
+
+        for pair in route or ():
+            self._dependents.setdefault(pair, set()).add(i)
+
+        self._revalue(i)
+
+    def _revalue(self, i):
+        rate = self._rates[i] = self._price_of(self._routes[i])
+        value = self._amounts[i] * rate if not math.isnan(rate) else 0.0
+
+        self._total += value - self._values[i]
+        self._values[i] = value
+
+    def set_balance(self, currency, amount):
+        currency = currency.lower()
+
+        with self._lock:
+            i = self._index.get(currency)
+
+            if i is None:
+                i = self._add_currency(currency)
+
+            self._amounts[i] = float(amount)
+            self._revalue(i)
+
+    def set_price(self, pair, price):
+        pair = pair.lower()
+
+        with self._lock:
+            known = pair in self._prices
+
+            self._prices[pair] = float(price)
+
+            if not known:
+                # A new market may give unpriced currencies a route, or a shorter one
+                for i in range(len(self._currencies)):
+                    self._reroute(i)
+            else:
+                for i in self._dependents.get(pair, ()):
+                    self._revalue(i)
+
+    def on_ticker(self, pair, ticker, changed=None):
+        """
+        A callback for TickerPoller.subscribe(), updates the price by last price
+        """
+
+        if changed is None or 'last' in changed:
+            self.set_price(pair, ticker['last'])
+
+    def update_tickers(self, tickers):
+        """
+        :param tickers: a dict maps pairs to tickers, e.g. from get_public_all_tickers()
+        """
+
+        with self._lock:
+            for pair, ticker in tickers.items():
+                self._prices[pair.lower()] = float(ticker['last'])
+
+            self._rebuild()
+
+    def update_balances(self, balances):
+        """
+        :param balances: a list of accounts, e.g. from get_private_account_balances()
+        """
+
+        with self._lock:
+            for account in balances:
+                currency = account['currency'].lower()
+
+                if currency not in self._index:
+                    self._add_currency(currency)
+
+                self._amounts[self._index[currency]] = float(account['balance']) + float(account.get('locked') or 0)
+
+            self._rebuild()
+
+    def _rebuild(self):
+        # Recompute every route and value, also clears rounding drift of total
+        self._dependents.clear()
+        self._total = 0.0
+
+        for i in range(len(self._currencies)):
+            self._routes[i] = None
+            self._values[i] = 0.0
+            self._reroute(i)
+
+        self._total = math.fsum(self._values)
+
+    def refresh(self, client):
+        """
+        Fetch all balances and tickers, then revalue the whole portfolio
+        """
+
+        self.update_tickers(client.get_public_all_tickers())
+        self.update_balances(client.get_private_account_balances())
+
+
+class RealizedPnL(object):
+    """
+    Realized profit and loss by average cost for every market, computed from
+    trades of get_private_trade_history(), e.g. files written by
+    `python -m max export trades`
+
+    Fees paid in quote currency are included, fees in base currency reduce the
+    bought volume, and fees in other currencies (e.g. MAX) are summed in fees
+    """
+
+    def __init__(self, markets=None):
+        """
+        :param markets: a dict maps market names to (base, quote), e.g. from get_public_all_markets()
+        """
+
+        self._markets = markets
+        self._seen = set()
+
+        self.positions = {}
+        self.costs = {}
+        self.realized = {}
+        self.fees = {}
+
+    @staticmethod
+    def markets_from(markets):
+        """
+        :param markets: a list from get_public_all_markets()
+        :return: a dict maps market names to (base, quote)
+        """
+
+        return {market['id']: (market['base_unit'], market['quote_unit']) for market in markets}
+
+    def add(self, trades):
+        """
+        :param trades: a list of trades, the seen ones are skipped
+        :return: the number of new trades
+        """
+
+        trades = sorted((t for t in trades if int(t['id']) not in self._seen), key=lambda t: int(t['id']))
+
+        for trade in trades:
+            self._seen.add(int(trade['id']))
+            self._apply(trade)
+
+        return len(trades)
+
+    def load(self, path):
+        """
+        :param path: a NDJSON file of trades, compressed by gzip if ending with .gz
+        :return: the number of new trades
+        """
+
+        if path.endswith('.gz'):
+            import gzip
+
+            file = gzip.open(path, 'rt', encoding='utf-8')
+        else:
+            file = open(path, encoding='utf-8')
+
+        with file:
+            return self.add(json.loads(line) for line in file if line.strip())
+
+    def _apply(self, trade):
+        market = trade['market'].lower()
+        base, quote = split_market(market, self._markets)
+
+        price = float(trade['price'])
+        volume = float(trade['volume'])
+        fee = float(trade.get('fee') or 0)
+        fee_currency = (trade.get('fee_currency') or quote).lower()
+
+        position = self.positions.get(market, 0.0)
+        cost = self.costs.get(market, 0.0)
+
+        if fee_currency not in (base, quote):
+            self.fees[fee_currency] = self.fees.get(fee_currency, 0.0) + fee
+            fee = 0.0
+
+        if trade['side'] in ('bid', 'buy'):
+            cost += price * volume + (fee if fee_currency == quote else 0.0)
+            position += volume - (fee if fee_currency == base else 0.0)
+        elif trade['side'] in ('ask', 'sell') and position > 0:
+            # Realize the sold part at average cost, selling beyond position is ignored
+            sold = min(volume, position)
+            average = cost / position
+
+            self.realized[market] = self.realized.get(market, 0.0) + \
+                sold * (price - average) - (fee if fee_currency == quote else fee * price)
+
+            cost -= average * sold
+            position -= sold
+
+        self.positions[market] = position
+        self.costs[market] = cost
+
+    def average_cost(self, market):
+        position = self.positions.get(market, 0.0)
+
+        return self.costs.get(market, 0.0) / position if position > 0 else 0.0
+
+    def total(self, portfolio):
+        """
+        :param portfolio: a Portfolio to convert realized PnL into its quote currency
+        :return: the total realized PnL in quote currency of the portfolio, markets
+                 of unpriced quote currencies are skipped, see unpriced()
+        """
+
+        values = (pnl * portfolio.rate(split_market(market, self._markets)[1])
+                  for market, pnl in self.realized.items())
+
+        return math.fsum(value for value in values if not math.isnan(value))
+
+    def unpriced(self, portfolio):
+        """
+        :return: a list contains quote currencies with realized PnL but no price in the portfolio
+        """
+
+        quotes = {split_market(market, self._markets)[1] for market, pnl in self.realized.items() if pnl != 0}
+
+        return sorted(quote for quote in quotes if math.isnan(portfolio.rate(quote)))
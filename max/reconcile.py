@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from .helpers import get_current_timestamp
+
+OPEN_STATES = ('wait', 'convert')
+ALL_STATES = ('wait', 'convert', 'done', 'cancel', 'finalizing', 'failed')
+
+# States an order never leaves, a 'finalizing' order is closed but still settling
+FINAL_STATES = ('done', 'cancel', 'failed')
+
+# Kinds of Diff
+FILL = 'fill'
+CANCEL = 'cancel'
+DONE = 'done'
+FAILED = 'failed'
+UNKNOWN = 'unknown'
+
+_CLOSES = {'cancel': CANCEL, 'done': DONE, 'failed': FAILED}
+
+Diff = namedtuple('Diff', ('kind', 'order_id', 'data'))
+
+
+class Reconciler(object):
+    """
+    Keep a local view of orders of one trading pair, and sync it with the
+    exchange by diffs instead of paging through the whole order history
+
+    Every run fetches open orders, plus orders created since the checkpoint
+    of last run, looks up orders which left the open list and orders whose
+    executed volume changed, then emits the minimal Diff list of:
+
+    - fill: a new trade of an order, data is the trade
+    - cancel / done / failed: an order reached its final state, data is the order,
+      an order leaving the open list through 'finalizing' is followed until then
+    - unknown: an order not placed through this view, data is the order
+
+    >>> reconciler = Reconciler('maxtwd')
+    >>> reconciler.track(client.set_private_create_order('maxtwd', 'sell', 100, 999))
+    >>> for diff in reconciler.reconcile(client):
+    ...     print(diff.kind, diff.order_id)
+    """
+
+    def __init__(self, pair, workers=8, limit=100, slack=60):
+        """
+        :param pair: the trading pair to reconcile
+        :param workers: the concurrent lookups of orders and trades
+        :param limit: the orders limit of each page
+        :param slack: the seconds to look back before checkpoint for clock skew
+        """
+
+        self.pair = pair.lower()
+        self.checkpoint = None
+
+        self._orders = {}
+        self._workers = int(workers)
+        self._limit = int(limit)
+        self._slack = int(slack)
+
+    def __len__(self):
+        return len(self._orders)
+
+    def get(self, _id):
+        return self._orders.get(int(_id))
+
+    def open_orders(self):
+        return [order for order in self._orders.values() if order['state'] in OPEN_STATES]
+
+    def track(self, order, trades=()):
+        """
+        :param order: an order dict returned by the exchange
+        :param trades: the trades of the order already known
+        """
+
+        self._orders[int(order['id'])] = {
+            'id': int(order['id']),
+            'state': order['state'],
+            'created_at': int(order['created_at']),
+            'executed_volume': str(order.get('executed_volume') or '0'),
+            'trades': set(int(trade['id']) for trade in trades),
+        }
+
+    def to_dict(self):
+        """
+        :return: a JSON serializable dict to restore the view after restart
+        """
+
+        return {
+            'pair': self.pair,
+            'checkpoint': self.checkpoint,
+            'orders': [dict(order, trades=sorted(order['trades'])) for order in self._orders.values()],
+        }
+
+    @classmethod
+    def from_dict(cls, state, **kwargs):
+        reconciler = cls(state['pair'], **kwargs)
+        reconciler.checkpoint = state['checkpoint']
+
+        for order in state['orders']:
+            reconciler._orders[int(order['id'])] = dict(order, trades=set(order['trades']))
+
+        return reconciler
+
+    def _fetch_orders(self, client, states, since=None):
+        orders = []
+        page = 1
+
+        while True:
+            # Newest first, so paging could stop once reaching the checkpoint
+            result = client.get_private_order_history(self.pair, list(states), sort='desc',
+                                                      page=page, limit=self._limit)
+            orders.extend(result)
+
+            if len(result) < self._limit:
+                break
+            if since is not None and int(result[-1]['created_at']) < since:
+                break
+
+            page += 1
+
+        return orders
+
+    def reconcile(self, client):
+        """
+        :param client: the client to fetch orders and trades with
+        :return: a list contains Diff in order of fills, closes and unknowns
+        """
+
+        started = get_current_timestamp() // 1000
+        remote = {int(order['id']): order for order in self._fetch_orders(client, OPEN_STATES)}
+
+        if self.checkpoint is not None:
+            since = self.checkpoint - self._slack
+
+            for order in self._fetch_orders(client, ALL_STATES, since):
+                if int(order['created_at']) >= since:
+                    remote.setdefault(int(order['id']), order)
+
+        with ThreadPoolExecutor(self._workers) as executor:
+            # Orders left the open list before the window, fetch their final states
+            missing = [_id for _id, order in self._orders.items()
+                       if order['state'] not in FINAL_STATES and _id not in remote]
+
+            for order in executor.map(lambda _id: client.get_private_order_detail(_id), missing):
+                remote[int(order['id'])] = order
+
+            changed = [_id for _id, order in remote.items()
+                       if float(order.get('executed_volume') or 0) > 0 and
+                       (_id not in self._orders or
+                        float(order['executed_volume']) != float(self._orders[_id]['executed_volume']))]
+
+            trades = dict(zip(changed, executor.map(lambda _id: client.get_private_executed_trades(_id), changed)))
+
+        fills = []
+        closes = []
+        unknowns = []
+
+        for _id, order in remote.items():
+            local = self._orders.get(_id)
+
+            if local is None:
+                unknowns.append(Diff(UNKNOWN, _id, order))
+
+                self.track(order)
+                local = self._orders[_id]
+            elif local['state'] not in FINAL_STATES and order['state'] in FINAL_STATES:
+                closes.append(Diff(_CLOSES[order['state']], _id, order))
+
+            for trade in sorted(trades.get(_id, ()), key=lambda t: int(t['id'])):
+                if int(trade['id']) not in local['trades']:
+                    local['trades'].add(int(trade['id']))
+                    fills.append(Diff(FILL, _id, trade))
+
+            local['state'] = order['state']
+            local['executed_volume'] = str(order.get('executed_volume') or '0')
+
+        self.checkpoint = started
+        self.prune()
+
+        return fills + closes + unknowns
+
+    def prune(self):
+        """
+        Forget orders in final states created before the look back window
+        """
+
+        if self.checkpoint is None:
+            return
+
+        since = self.checkpoint - self._slack
+
+        for _id in [_id for _id, order in self._orders.items()
+                    if order['state'] in FINAL_STATES and order['created_at'] < since]:
+            del self._orders[_id]
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+import codecs
+import json
+
+# Bytes read from the socket each time the decoder runs out of data
+STREAM_CHUNK_SIZE = 16 * 1024
+
+_WHITESPACE = ' \t\n\r'
+_NUMBER = '0123456789+-.eE'
+
+
+def iter_json_array(response, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Decode a top-level JSON array item by item while reading the response,
+    so only one item and one chunk are held in memory at the same time
+
+    If the top-level value is not an array (e.g. an error object), it will be
+    decoded as a whole and yielded as the only item
+
+    :param response: a file-like object with read(size)
+    :param chunk_size: the bytes to read from the response each time
+    :return: a generator yields each item of the array
+    """
+
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder('utf-8')()
+
+    buffer = ''
+    pos = 0
+    eof = False
+
+    def _more():
+        nonlocal buffer, pos, eof
+
+        chunk = response.read(chunk_size)
+
+        if not chunk:
+            buffer = buffer[pos:] + text.decode(b'', True)
+            eof = True
+        else:
+            buffer = buffer[pos:] + text.decode(chunk)
+
+        pos = 0
+
+    def _peek():
+        nonlocal pos
+
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+
+            if pos < len(buffer):
+                return buffer[pos]
+            if eof:
+                return ''
+
+            _more()
+
+    if _peek() != '[':
+        while not eof:
+            _more()
+
+        yield json.loads(buffer[pos:])
+        return
+
+    pos += 1
+
+    if _peek() == ']':
+        return
+
+    while True:
+        _peek()
+
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+
+            _more()
+            continue
+
+        # A number may be cut in half by the chunk (e.g. '1.' of '1.25'), read more
+        # until a character after it is not a part of number
+        if isinstance(item, (int, float)) and not isinstance(item, bool) and not eof:
+            stop = end
+
+            while stop < len(buffer) and buffer[stop] in _NUMBER:
+                stop += 1
+
+            if stop >= len(buffer):
+                _more()
+                continue
+
+        pos = end
+        yield item
+
+        separator = _peek()
+
+        if separator == ']':
+            return
+        if separator != ',':
+            raise json.JSONDecodeError('Expecting , or ] delimiter', buffer, pos)
+
+        pos += 1
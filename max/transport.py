@@ -0,0 +1,557 @@
+#!/usr/bin/env python3
+
+import http.client
+import io
+import json
+import os
+import threading
+import zlib
+
+from collections import OrderedDict
+
+from time import monotonic as _monotonic
+from time import sleep as _sleep
+from time import time as _time
+from urllib.error import HTTPError
+from urllib.parse import parse_qsl
+from urllib.parse import urlsplit
+from urllib.request import urlopen
+
+# These query fields change on every call, never use them to look up a recorded response
+VOLATILE_FIELDS = ('nonce', 'path')
+
+# Response headers kept in recordings, the others (e.g. Set-Cookie) are not needed to replay
+RECORDED_HEADERS = ('content-type', 'etag', 'last-modified')
+
+# Records buffered by RecordingTransport before flushing the archive, by count or by seconds
+RECORD_FLUSH_SIZE = 32
+RECORD_FLUSH_INTERVAL = 1.0
+
+# Chunk size while inflating compressed responses
+DECODE_CHUNK_SIZE = 64 * 1024
+
+
+def normalize_request(method, url):
+    """
+    Build the lookup key of a request, which is the method, the endpoint and
+    the sorted query without nonce, so the same call always gets the same key
+
+    :param method: the HTTP method of the request
+    :param url: the full url of the request
+    :return: a string key of the request
+    """
+
+    parts = urlsplit(url)
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, True) if k not in VOLATILE_FIELDS)
+
+    return f"{method.upper()} {parts.path}?{'&'.join(f'{k}={v}' for k, v in query)}"
+
+
+class Response(object):
+    """
+    A file-like response served from memory, quacks like the one from urlopen
+    """
+
+    def __init__(self, url, body, status=200, headers=None):
+        self.url = url
+        self.status = status
+        self.headers = dict(headers or {})
+
+        self._body = io.BytesIO(body)
+
+    def read(self, size=-1):
+        return self._body.read(size)
+
+    def getcode(self):
+        return self.status
+
+    def close(self):
+        self._body.close()
+
+
+class DecodedResponse(object):
+    """
+    Inflate a gzip or deflate encoded response chunk by chunk while reading
+    """
+
+    def __init__(self, response, encoding):
+        self._response = response
+        self._raw = encoding == 'deflate'
+
+        # 47 means gzip or zlib header is detected automatically
+        self._decoder = zlib.decompressobj(47)
+        self._buffer = b''
+        self._eof = False
+
+        self.url = getattr(response, 'url', None)
+        self.status = getattr(response, 'status', 200)
+        self.headers = {k: v for k, v in response.headers.items()
+                        if k.lower() not in ('content-encoding', 'content-length')}
+
+    def _fill(self):
+        chunk = self._response.read(DECODE_CHUNK_SIZE)
+
+        if not chunk:
+            self._buffer += self._decoder.flush()
+            self._eof = True
+            return
+
+        try:
+            self._buffer += self._decoder.decompress(chunk)
+        except zlib.error:
+            # Some servers send raw deflate stream without zlib header
+            if not self._raw:
+                raise
+
+            self._raw = False
+            self._decoder = zlib.decompressobj(-zlib.MAX_WBITS)
+            self._buffer += self._decoder.decompress(chunk)
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            while not self._eof:
+                self._fill()
+        else:
+            while len(self._buffer) < size and not self._eof:
+                self._fill()
+
+        if size is None or size < 0:
+            data, self._buffer = self._buffer, b''
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+
+        return data
+
+    def getcode(self):
+        return self.status
+
+    def close(self):
+        self._response.close()
+
+
+def decode_error(error):
+    """
+    :param error: an HTTPError whose body may be compressed
+    :return: the same error, or a new one with inflated body if it is compressed
+    """
+
+    encoding = (error.headers.get('Content-Encoding') or '').lower() if error.headers is not None else ''
+
+    if encoding not in ('gzip', 'deflate'):
+        return error
+
+    response = DecodedResponse(error, encoding)
+
+    try:
+        body = response.read()
+    finally:
+        response.close()
+
+    return HTTPError(error.url, error.code, error.msg, response.headers, io.BytesIO(body))
+
+
+class Transport(object):
+    """
+    The default transport which sends requests over network with urlopen
+
+    Compressed responses are inflated on the fly, and public GET responses
+    with ETag or Last-Modified are kept in a small LRU cache, so the next same
+    request (nonce ignored) is sent conditionally and a 304 is served from it,
+    unless send() is called with cache=False (e.g. streamed calls)
+    """
+
+    def __init__(self, cache_size=256):
+        self._cache = OrderedDict()
+        self._cache_size = int(cache_size)
+        self._cache_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def send(self, request, data=None, timeout=None, cache=True):
+        """
+        :param request: a prepared urllib.request.Request object
+        :param data: the encoded body for POST requests
+        :param timeout: the timeout in seconds
+        :param cache: False to neither look up nor store the response in cache
+        :return: a file-like response object
+        """
+
+        url = request.full_url
+        cacheable = cache and self._cache_size > 0 and request.get_method() == 'GET' \
+            and not request.has_header('X-max-accesskey')
+        key = normalize_request('GET', url) if cacheable else None
+        cached = self._cache_get(key) if cacheable else None
+
+        if cached is not None:
+            if 'ETag' in cached[1]:
+                request.add_header('If-None-Match', cached[1]['ETag'])
+            if 'Last-Modified' in cached[1]:
+                request.add_header('If-Modified-Since', cached[1]['Last-Modified'])
+
+        try:
+            response = self._open(request, data, timeout)
+        except HTTPError as error:
+            if error.code == 304 and cached is not None:
+                error.close()
+                return Response(url, cached[0], 200, cached[1])
+
+            # Error responses could be compressed too
+            raise decode_error(error) from None
+
+        encoding = response.headers.get('Content-Encoding', '').lower()
+
+        if encoding in ('gzip', 'deflate'):
+            response = DecodedResponse(response, encoding)
+
+        if cacheable:
+            validators = {k: response.headers.get(k) for k in ('ETag', 'Last-Modified')
+                          if response.headers.get(k)}
+
+            if len(validators) > 0:
+                try:
+                    body = response.read()
+                finally:
+                    response.close()
+
+                self._cache_put(key, body, validators)
+
+                return Response(url, body, getattr(response, 'status', 200), response.headers)
+
+        return response
+
+    def _open(self, request, data=None, timeout=None):
+        return urlopen(request, data=data, timeout=timeout)
+
+    def _cache_get(self, key):
+        with self._cache_lock:
+            entry = self._cache.get(key)
+
+            if entry is not None:
+                self._cache.move_to_end(key)
+
+            return entry
+
+    def _cache_put(self, key, body, validators):
+        with self._cache_lock:
+            self._cache[key] = (body, validators)
+            self._cache.move_to_end(key)
+
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+
+    def close(self):
+        with self._cache_lock:
+            self._cache.clear()
+
+
+class PooledResponse(object):
+    """
+    Wrap a response from PooledTransport, its connection goes back to the pool
+    on closing if the body is fully read, or it is dropped
+    """
+
+    def __init__(self, url, response, release):
+        self._response = response
+        self._release = release
+
+        self.url = url
+        self.status = response.status
+        self.headers = response.headers
+
+    def read(self, size=-1):
+        return self._response.read(None if size is None or size < 0 else size)
+
+    def getcode(self):
+        return self.status
+
+    def close(self):
+        if self._release is not None:
+            self._release(self._response.isclosed())
+            self._release = None
+
+        self._response.close()
+
+
+class PooledTransport(Transport):
+    """
+    A transport keeps HTTP connections alive and reuses them between requests,
+    it is thread-safe so many clients could share one instance
+
+    Proxy settings from environment are not applied, use Transport for that
+    """
+
+    def __init__(self, maxsize=10, cache_size=256):
+        super().__init__(cache_size)
+
+        self._maxsize = int(maxsize)
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def _acquire(self, scheme, host):
+        with self._lock:
+            idle = self._pools.setdefault((scheme, host), [])
+
+            if len(idle) > 0:
+                return idle.pop(), True
+
+        if scheme == 'https':
+            return http.client.HTTPSConnection(host), False
+        else:
+            return http.client.HTTPConnection(host), False
+
+    def _put(self, scheme, host, conn, reusable):
+        if reusable:
+            with self._lock:
+                idle = self._pools.setdefault((scheme, host), [])
+
+                if len(idle) < self._maxsize:
+                    idle.append(conn)
+                    return
+
+        conn.close()
+
+    def _open(self, request, data=None, timeout=None):
+        parts = urlsplit(request.full_url)
+        method = request.get_method()
+        headers = dict(request.header_items())
+
+        while True:
+            conn, reused = self._acquire(parts.scheme, parts.netloc)
+            conn.timeout = timeout
+
+            if conn.sock is not None:
+                conn.sock.settimeout(timeout)
+
+            try:
+                conn.request(method, request.selector, body=data, headers=headers)
+                response = conn.getresponse()
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                conn.close()
+
+                # Only retry idempotent requests on a connection closed by server
+                if reused and method == 'GET':
+                    continue
+
+                raise
+            except Exception:
+                conn.close()
+                raise
+
+            break
+
+        def _release(reusable):
+            self._put(parts.scheme, parts.netloc, conn, reusable and not response.will_close)
+
+        if response.status >= 300:
+            body = response.read()
+            _release(True)
+
+            raise decode_error(HTTPError(request.full_url, response.status, response.reason,
+                                         response.headers, io.BytesIO(body)))
+
+        return PooledResponse(request.full_url, response, _release)
+
+    def close(self):
+        super().close()
+
+        with self._lock:
+            pools, self._pools = self._pools, {}
+
+        for idle in pools.values():
+            for conn in idle:
+                conn.close()
+
+
+class RecordingTransport(Transport):
+    """
+    Send requests with another transport and record every request/response
+    pair into a gzip compressed archive, only headers needed to replay are kept
+
+    Each line of the archive is a JSON record, and its key is built by
+    normalize_request() so ReplayTransport could index it on loading
+
+    The archive is overwritten unless append is True, then a session marker
+    is written first, since offsets of records restart from 0 in every session
+
+    Records are flushed every RECORD_FLUSH_SIZE records or RECORD_FLUSH_INTERVAL
+    seconds, so an archive not closed (e.g. the process was killed) is still
+    readable up to the last flush, close it or use it as a context manager to
+    keep every record
+
+    >>> with RecordingTransport('session.jsonl.gz') as transport:
+    ...     Client(key, secret, transport=transport).get_private_account_balances()
+    """
+
+    def __init__(self, path, transport=None, append=False):
+        super().__init__(0)
+
+        self._path = path
+        self._transport = transport if transport is not None else Transport()
+
+        import gzip
+
+        if append and os.path.exists(path):
+            lines, complete = _read_archive(path)
+
+            # Appending after an unterminated member would corrupt the whole archive
+            if not complete:
+                with gzip.open(f"{path}.tmp", 'wt', encoding='utf-8') as file:
+                    file.writelines(lines)
+
+                os.replace(f"{path}.tmp", path)
+
+        self._file = gzip.open(path, 'at' if append else 'wt', encoding='utf-8')
+        self._lock = threading.Lock()
+        self._started = _monotonic()
+
+        self._pending = 0
+        self._flushed = self._started
+
+        self._file.write(json.dumps({'session': _time()}) + '\n')
+
+    def send(self, request, data=None, timeout=None, cache=True):
+        offset = _monotonic() - self._started
+
+        try:
+            response = self._transport.send(request, data, timeout, cache=cache)
+        except HTTPError as error:
+            body = error.read()
+            self._record(request, offset, error.code, error.headers, body)
+
+            raise HTTPError(error.url, error.code, error.msg, error.headers, io.BytesIO(body))
+
+        try:
+            body = response.read()
+        finally:
+            response.close()
+
+        status = getattr(response, 'status', 200)
+        self._record(request, offset, status, response.headers, body)
+
+        return Response(request.full_url, body, status, response.headers)
+
+    def _record(self, request, offset, status, headers, body):
+        record = {
+            'key': normalize_request(request.get_method(), request.full_url),
+            'offset': round(offset, 6),
+            'status': status,
+            'headers': {k: v for k, v in (headers or {}).items() if k.lower() in RECORDED_HEADERS},
+            'body': body.decode('utf-8'),
+        }
+
+        with self._lock:
+            self._file.write(json.dumps(record, separators=(',', ':')) + '\n')
+            self._pending += 1
+
+            now = _monotonic()
+
+            if self._pending >= RECORD_FLUSH_SIZE or now - self._flushed >= RECORD_FLUSH_INTERVAL:
+                self._file.flush()
+                self._pending = 0
+                self._flushed = now
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+        self._transport.close()
+
+
+def _read_archive(path):
+    """
+    :return: a tuple of (lines, complete), lines are read until the end or the
+             last flush of an archive not closed, complete is False for the latter
+    """
+
+    import gzip
+
+    lines = []
+
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as file:
+            for line in file:
+                lines.append(line)
+    except EOFError:
+        return [line for line in lines if line.endswith('\n')], False
+
+    return lines, True
+
+
+class ReplayTransport(Transport):
+    """
+    Serve requests from an archive written by RecordingTransport without network
+
+    Responses for the same key are replayed in recorded order, the last one is
+    repeated once they are exhausted, set realtime to True to replay with the
+    original timing instead of full speed
+    """
+
+    def __init__(self, path, realtime=False, strict=True):
+        super().__init__()
+
+        self._index = {}
+        self._cursor = {}
+        self._lock = threading.Lock()
+
+        self._realtime = realtime
+        self._started = None
+        self._strict = strict
+
+        # Sessions are replayed one after another, offsets of a session start
+        # from the last offset of the previous one
+        base = last = 0.0
+
+        for line in _read_archive(path)[0]:
+            record = json.loads(line)
+
+            if 'session' in record:
+                base = last
+                continue
+
+            record['offset'] = last = base + record['offset']
+            self._index.setdefault(record['key'], []).append(record)
+
+    def __len__(self):
+        return sum(len(records) for records in self._index.values())
+
+    def send(self, request, data=None, timeout=None, cache=True):
+        key = normalize_request(request.get_method(), request.full_url)
+
+        with self._lock:
+            records = self._index.get(key)
+
+            if not records:
+                if self._strict:
+                    raise LookupError(f"no recorded response for {key}")
+
+                return Transport.send(self, request, data, timeout, cache)
+
+            cursor = self._cursor.get(key, 0)
+            self._cursor[key] = min(cursor + 1, len(records) - 1)
+
+            if self._started is None:
+                self._started = _monotonic() - records[cursor]['offset']
+
+        record = records[cursor]
+
+        if self._realtime:
+            delay = record['offset'] - (_monotonic() - self._started)
+
+            if delay > 0:
+                _sleep(delay)
+
+        body = record['body'].encode('utf-8')
+
+        if record['status'] >= 400:
+            raise HTTPError(request.full_url, record['status'], 'Replayed', record['headers'], io.BytesIO(body))
+
+        return Response(request.full_url, body, record['status'], record['headers'])
+
+    def rewind(self):
+        with self._lock:
+            self._cursor.clear()
+            self._started = None
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+
+import json
+
+from urllib.parse import parse_qsl
+from urllib.parse import urlencode
+from urllib.parse import urlsplit
+
+from max.builder import build_url
+from max.builder import encode_query
+from max.client import Client
+from max.constants import PRIVATE_API_URL
+from max.constants import PRIVATE_API_VERSION
+from max.constants import PUBLIC_API_URL
+from max.constants import PUBLIC_API_VERSION
+
+NONCE = 1560000000000
+
+# (scope, endpoint, query)
+CASES = [
+    ('private', 'members/accounts', {}),
+    ('private', 'orders', {'market': 'maxtwd', 'order_by': 'asc', 'pagination': True,
+                           'page': 1, 'limit': 100, 'offset': 0, 'state': ['cancel', 'wait', 'done']}),
+    ('private', 'trades/my', {'market': 'btctwd', 'timestamp': '', 'from': '', 'to': '',
+                              'order_by': 'desc', 'pagination': False, 'page': 3, 'limit': 50, 'offset': 0}),
+    ('private', 'withdrawal', {'uuid': '18022603540001', 'state': 'done'}),
+    ('private', 'orders', {'market': 'maxtwd', 'side': 'sell', 'volume': '100', 'price': '0.001',
+                           'ord_type': 'limit', 'client_oid': 'my-order/1 #a&b'}),
+    ('private', 'orders', {'state[]': ['wait'], 'market': 'ethtwd'}),
+    ('private', 'orders', {'pagination': True, 'sort': False, 'group_id': None}),
+    ('private', 'orders', {'state': ('wait', 'convert'), 'market': 'btctwd'}),
+    ('private', 'orders', {'state': [], 'market': 'btctwd'}),
+    ('private', 'orders', {'a&b': '1', 'k=v': '2', 'x y': '3', 'sym/[]': '4', '幣別': '5', 'ключ': 'значение'}),
+    ('private', 'orders', {'client_oid': '中文 +%?=#', 'note': 'café'}),
+    ('public', 'tickers', {}),
+    ('public', 'k', {'market': 'maxtwd', 'limit': 30, 'period': 1, 'timestamp': ''}),
+]
+
+
+def legacy_url(scope, endpoint, query, nonce):
+    # The encoding before max/builder.py, as _build_url() and _send_request() did
+    body = {'path': f"/api/{PRIVATE_API_VERSION}/{endpoint}.json", 'nonce': nonce}
+    body.update(query)
+    query = dict(query)
+
+    for key in list(body):
+        if type(body[key]) is list and not key[-2:] == '[]':
+            body[f"{key}[]"] = body.pop(key)
+
+            if key in query:
+                query.pop(key)
+
+    query.update(body)
+
+    if scope.lower() == 'private':
+        url = f"{PRIVATE_API_URL}/{PRIVATE_API_VERSION}/{endpoint}.json"
+    else:
+        url = f"{PUBLIC_API_URL}/{PUBLIC_API_VERSION}/{endpoint}.json"
+
+    return (f"{url}?{urlencode(query, True, '/[]')}" if len(query) > 0 else url).lower()
+
+
+def current_url(scope, endpoint, query, nonce):
+    body = {'path': f"/api/{PRIVATE_API_VERSION}/{endpoint}.json", 'nonce': nonce}
+    body.update(query)
+
+    return build_url(scope, endpoint, body)
+
+
+def test_same_fields_as_legacy():
+    for scope, endpoint, query in CASES:
+        # Tuples were not renamed to key[] by legacy one, but are sent as JSON arrays too
+        listed = {k: list(v) if type(v) is tuple else v for k, v in query.items()}
+
+        legacy = urlsplit(legacy_url(scope, endpoint, listed, NONCE))
+        current = urlsplit(current_url(scope, endpoint, query, NONCE))
+
+        # Only the order and lowercasing differ, legacy lowercased the whole url
+        assert legacy.path == current.path, (legacy, current)
+        assert sorted(parse_qsl(legacy.query, True)) == \
+            sorted((k.lower(), v.lower()) for k, v in parse_qsl(current.query, True)), (legacy.query, current.query)
+
+
+def test_url_order_is_payload_order():
+    for scope, endpoint, query in CASES:
+        client = Client('', '', nonce=lambda: NONCE)
+        body = client._build_body(endpoint, query)
+        payload = json.loads(json.dumps(body))
+
+        expected = []
+
+        for key, value in payload.items():
+            if type(value) is list:
+                key = key if key[-2:] == '[]' else f"{key}[]"
+                expected.extend((key, str(item)) for item in value)
+            else:
+                expected.append((key, value))
+
+        pairs = parse_qsl(urlsplit(client._build_url(scope, endpoint, body)).query, True)
+
+        assert [k for k, _ in pairs] == [k for k, _ in expected], (pairs, expected)
+
+        for (_, value), (_, item) in zip(pairs, expected):
+            if type(item) is str:
+                assert value == item, (value, item)
+
+
+def test_values():
+    assert encode_query({'a': True, 'b': False, 'c': None, 'd': 0, 'e': 1.5, 'f': ''}) == \
+        'a=true&b=false&c=None&d=0&e=1.5&f='
+    assert encode_query({'s': 'a b&c=d/[]+%'}) == 's=a+b%26c%3Dd/[]%2B%25'
+
+
+def test_lists():
+    assert encode_query({'state': ['wait', 'done']}) == 'state[]=wait&state[]=done'
+    assert encode_query({'state': ('wait', 'done')}) == 'state[]=wait&state[]=done'
+    assert encode_query({'state[]': ['wait']}) == 'state[]=wait'
+    assert encode_query({'state': [], 'market': 'btctwd'}) == 'market=btctwd'
+    assert encode_query({'ids': [1, True, None]}) == 'ids[]=1&ids[]=true&ids[]=None'
+
+
+def test_keys():
+    assert encode_query({'a&b': 1, 'k=v': 2, 'x y': 3, 'sym/[]': 4}) == 'a%26b=1&k%3Dv=2&x+y=3&sym/[]=4'
+    assert encode_query({'幣別': 'twd'}) == '%E5%B9%A3%E5%88%A5=twd'
+    assert encode_query({'幣別': ['twd']}) == '%E5%B9%A3%E5%88%A5[]=twd'
+
+
+def test_empty_body():
+    url = f"{PUBLIC_API_URL}/{PUBLIC_API_VERSION}/tickers.json"
+
+    assert build_url('public', 'tickers') == url
+    assert build_url('public', 'tickers', {}) == url
+    assert build_url('private', 'members/me', {}) == f"{PRIVATE_API_URL}/{PRIVATE_API_VERSION}/members/me.json"
+    assert encode_query({}) == ''
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+
+    print(f"[I] {len(CASES)} cases encoded the same as legacy implementation")
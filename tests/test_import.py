@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+
+import importlib
+import json
+import os
+import subprocess
+import sys
+
+import max
+
+# Modules only needed by optional features, a public call must not load them
+OPTIONAL_MODULES = (
+    'concurrent.futures', 'gzip', 'hmac', 'multiprocessing',
+    'max.cli', 'max.health', 'max.manager', 'max.ohlcv', 'max.poller', 'max.pool', 'max.portfolio',
+    'max.reconcile', 'max.stream',
+)
+
+SNIPPET = '''
+import json, sys, time
+
+started = time.perf_counter()
+
+import max
+from max import Client
+from max.transport import Response, Transport
+
+elapsed = time.perf_counter() - started
+
+
+class OfflineTransport(Transport):
+    def send(self, request, data=None, timeout=None):
+        return Response(request.full_url, b'1560000000')
+
+
+Client('', '', transport=OfflineTransport()).get_public_server_time()
+print(json.dumps({'elapsed': elapsed, 'modules': sorted(sys.modules)}))
+'''
+
+
+def run_snippet():
+    """
+    :return: a dict of the import time and modules loaded by a fresh interpreter
+    """
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.check_output([sys.executable, '-c', SNIPPET], cwd=root)
+
+    return json.loads(output)
+
+
+def test_public_call_loads_no_optional_modules():
+    modules = set(run_snippet()['modules'])
+    loaded = [name for name in OPTIONAL_MODULES if name in modules]
+
+    assert len(loaded) == 0, f"optional modules loaded by a public call: {', '.join(loaded)}"
+
+
+def test_lazy_exports():
+    for name in max.__all__:
+        module = importlib.import_module(f"max.{max._exports[name]}")
+
+        assert getattr(max, name) is getattr(module, name)
+
+    assert set(max.__all__) <= set(dir(max))
+
+
+if __name__ == '__main__':
+    test_public_call_loads_no_optional_modules()
+    test_lazy_exports()
+
+    print('[I] A public call loaded no optional modules')